@@ -37,6 +37,7 @@ rm -rf $RPM_BUILD_ROOT
 %files
 %doc README.md COPYING
 %{_bindir}/hawkular-cli
+%{_bindir}/hawkular-cli-benchmark
 %{python_sitelib}/*
 
 
@@ -0,0 +1,140 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import re
+
+STATS = ['min', 'max', 'avg', 'sum', 'count', 'median', 'delta', 'rate']
+
+_PERCENTILE = re.compile(r'^p(\d{1,2}(\.\d+)?)$')
+
+def _numpy():
+    """ Import numpy, raises ValueError if it is missing
+
+    numpy is only required for client side aggregation, and is slow to
+    import, so it is not imported with this module.
+    """
+    try:
+        import numpy
+    except ImportError:
+        raise ValueError('client side aggregation requires the numpy module')
+    return numpy
+
+def check_stats(names):
+    """ Check that aggregation stats are valid, raises ValueError if not
+    """
+    _numpy()
+    for name in names:
+        if name not in STATS and not _PERCENTILE.match(name):
+            raise ValueError('unknown aggregation: {0}'.format(name))
+
+def to_arrays(values):
+    """ Convert datapoint dicts to (timestamps, values) numpy arrays sorted by time
+    """
+    numpy = _numpy()
+    timestamps = numpy.fromiter((v.get('timestamp') for v in values), dtype=numpy.int64)
+    data = numpy.fromiter((v.get('value') for v in values), dtype=numpy.float64,
+                          count=len(timestamps))
+    order = numpy.argsort(timestamps, kind='mergesort')
+    return timestamps[order], data[order]
+
+def _deltas(timestamps, values, start, bucket, buckets):
+    """ Sum counter increases in each bucket, treating a decrease as a counter reset
+    """
+    numpy = _numpy()
+    if len(values) < 2:
+        return numpy.zeros(buckets)
+    diffs = numpy.diff(values)
+    resets = diffs < 0
+    diffs[resets] = values[1:][resets]
+    index = (timestamps[1:] - start) // bucket
+    return numpy.bincount(index, weights=diffs, minlength=buckets)[:buckets]
+
+def aggregate(series, start, end, bucket, stats):
+    """ Compute stats of a group of series in buckets
+
+    series is a list of (timestamps, values) arrays, one for each key of
+    the group, start and end are in milliseconds, and bucket is the bucket
+    duration in milliseconds (0 for one bucket). Value stats are computed
+    over the datapoints of all the series, delta and rate are computed for
+    each series and summed.
+
+    Returns a list of bucket dicts with start, end, samples and stats values.
+    """
+    numpy = _numpy()
+    bucket = bucket or max(end - start, 1)
+    buckets = max(int(numpy.ceil((end - start) / bucket)), 1)
+
+    series = [(t[(t >= start) & (t < end)], v[(t >= start) & (t < end)]) for t, v in series]
+    if series:
+        timestamps = numpy.concatenate([t for t, _ in series])
+        values = numpy.concatenate([v for _, v in series])
+    else:
+        timestamps = numpy.zeros(0, dtype=numpy.int64)
+        values = numpy.zeros(0)
+
+    # Group datapoints by bucket
+    index = (timestamps - start) // bucket
+    order = numpy.argsort(index, kind='mergesort')
+    index, values = index[order], values[order]
+    bounds = numpy.searchsorted(index, numpy.arange(buckets + 1))
+    counts = numpy.diff(bounds)
+    not_empty = counts > 0
+
+    # Bucket durations in seconds, the last bucket ends at end
+    edges = numpy.minimum(start + numpy.arange(buckets + 1) * bucket, end)
+    durations = numpy.maximum(numpy.diff(edges), 1) / 1000.0
+
+    columns = {'samples': counts}
+    deltas = None
+    for name in stats:
+        column = numpy.full(buckets, numpy.nan)
+        if name in ('delta', 'rate'):
+            if deltas is None:
+                deltas = sum((_deltas(t, v, start, bucket, buckets) for t, v in series),
+                             numpy.zeros(buckets))
+            column = deltas if name == 'delta' else deltas / durations
+        elif name == 'count':
+            column = counts.astype(numpy.float64)
+        elif len(values):
+            starts = bounds[:-1][not_empty]
+            if name == 'min':
+                column[not_empty] = numpy.minimum.reduceat(values, starts)
+            elif name == 'max':
+                column[not_empty] = numpy.maximum.reduceat(values, starts)
+            elif name == 'sum':
+                column[not_empty] = numpy.add.reduceat(values, starts)
+            elif name == 'avg':
+                column[not_empty] = numpy.add.reduceat(values, starts) / counts[not_empty]
+            else:
+                q = 50.0 if name == 'median' else float(_PERCENTILE.match(name).group(1))
+                for i in numpy.nonzero(not_empty)[0]:
+                    column[i] = numpy.percentile(values[bounds[i]:bounds[i + 1]], q)
+        columns[name] = column
+
+    rows = []
+    for i in range(buckets):
+        row = {'start': start + i * bucket,
+               'end': min(start + (i + 1) * bucket, end),
+               'samples': int(counts[i])}
+        for name in stats:
+            value = columns[name][i]
+            row[name] = None if numpy.isnan(value) else float(value)
+        rows.append(row)
+    return rows
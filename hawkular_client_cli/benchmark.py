@@ -0,0 +1,288 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import platform
+import argparse
+import subprocess
+from collections import OrderedDict
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2, peak memory is not reported
+    tracemalloc = None
+
+from hawkular_client_cli.command_line import CommandLine, _VERSION
+from hawkular_client_cli.mock_server import MockServer
+from hawkular_client_cli.output import TextStream
+
+_TENANT = 'bench'
+
+def _percentile(values, q):
+    """ Get the q percentile of a list of values, using the nearest rank
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(len(values) * q / 100.0), len(values) - 1)]
+
+def _seed(server, keys, values, tags=None):
+    """ Add metrics directly to the mock server store
+    """
+    now = int(time.time() * 1000)
+    for key in keys:
+        server.store.add(_TENANT, 'gauges', key,
+                         [{'timestamp': now - i * 100, 'value': float(i)} for i in range(values)])
+        server.store.metrics[(_TENANT, 'gauges', key)]['tags'].update(tags or {})
+
+def _push(server, workdir, options):
+    """ Push one value for each of N keys
+    """
+    return ['--no-autotags', '--batch-size', str(options.batch_size)] + \
+        ['bench/push/{0}={0}'.format(i) for i in range(options.keys)]
+
+def _read_tags(server, workdir, options):
+    """ Read values of N keys matching a tag
+    """
+    _seed(server, ['bench/read/{0}'.format(i) for i in range(options.keys)], options.values,
+          {'bench': 'read'})
+    return ['--read', '--tags', 'bench=read', '--parallel', str(options.parallel),
+            '--batch-size', str(options.batch_size)]
+
+def _read_paged(server, workdir, options):
+    """ Read a large number of values of one key, page by page
+    """
+    _seed(server, ['bench/paged'], options.points)
+    return ['--read', '--keys', 'bench/paged', '--limit', '0',
+            '--page-size', str(options.page_size)]
+
+def _tagging(server, workdir, options):
+    """ Push values for N keys, tagging them using many config file rules
+    """
+    config = os.path.join(workdir, 'config.yaml')
+    with io.open(config, 'w', encoding='utf-8') as f:
+        f.write('rules:\n')
+        for i in range(options.rules):
+            f.write('  - regex: bench/tag/{0}/.*\n    tags:\n      rule: r{0}\n'.format(i))
+        f.write('  - regex: .*\n    tags:\n      bench: tag\n')
+    return ['-c', config, '--parallel', str(options.parallel),
+            '--batch-size', str(options.batch_size)] + \
+        ['bench/tag/{0}/{1}=1'.format(i % options.rules, i) for i in range(options.keys)]
+
+def _triggers(server, workdir, options):
+    """ List N alert triggers matching a tag, with their conditions and alerts
+    """
+    now = int(time.time() * 1000)
+    for i in range(options.keys):
+        trigger_id = 'bench-trigger-{0}'.format(i)
+        server.store.add_trigger(_TENANT,
+            {'id': trigger_id, 'name': trigger_id, 'enabled': True, 'tags': {'bench': 'triggers'}},
+            [{'triggerId': trigger_id, 'triggerMode': 'FIRING', 'type': 'THRESHOLD',
+              'dataId': 'bench/{0}'.format(i), 'operator': 'GT', 'threshold': 1.0}],
+            [{'triggerId': trigger_id, 'ctime': now - j * 1000, 'severity': 'MEDIUM', 'status': 'OPEN'}
+             for j in range(options.values)])
+    return ['--triggers', '--trigger-details', '--tags', 'bench=triggers',
+            '--parallel', str(options.parallel), '--page-size', str(options.page_size)]
+
+SCENARIOS = OrderedDict([
+    ('push', _push),
+    ('read-tags', _read_tags),
+    ('read-paged', _read_paged),
+    ('tagging', _tagging),
+    ('triggers', _triggers),
+])
+
+def _run_once(name, options, trace_memory=False):
+    """ Run one scenario against a new mock server
+
+    Returns the run duration, the mock server requests, the output size and
+    the peak memory (if trace_memory is set and tracemalloc is available).
+    """
+    server = MockServer(latency=options.latency / 1000.0)
+    url = server.start()
+    workdir = tempfile.mkdtemp(prefix='hawkular-cli-bench-')
+    environ = {'HAWKULAR_URL': url, 'HAWKULAR_TENANT': _TENANT,
+               'HAWKULAR_USERNAME': _TENANT, 'HAWKULAR_PASSWORD': _TENANT}
+    trace_memory = trace_memory and tracemalloc is not None
+
+    stdout = sys.stdout
+    output = io.BytesIO()
+    try:
+        argv = SCENARIOS[name](server, workdir, options)
+        if '-c' not in argv:
+            # Do not use the system config file
+            argv = ['-c', os.devnull] + argv
+        argv = ['--no-daemon'] + argv
+
+        if trace_memory:
+            tracemalloc.start()
+        started = time.time()
+        sys.stdout = TextStream(output)
+        try:
+            CommandLine(argv, environ=environ).run()
+        except SystemExit as err:
+            if err.code:
+                raise RuntimeError('{0} failed: {1}'.format(
+                    name, output.getvalue().decode('utf-8').strip()))
+        finally:
+            sys.stdout = stdout
+        duration = time.time() - started
+        peak_memory = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    finally:
+        if trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(workdir)
+    return duration, list(server.requests), len(output.getvalue()), peak_memory
+
+def run_scenario(name, options):
+    """ Run one scenario, returns a results dict
+
+    Tracing memory allocations slows the cli down, so peak memory is
+    measured in a second run of the scenario.
+    """
+    duration, requests, output_bytes, _ = _run_once(name, options)
+    peak_memory = _run_once(name, options, trace_memory=True)[3]
+
+    latencies = [r[2] * 1000.0 for r in requests]
+    return OrderedDict([
+        ('scenario', name),
+        ('duration', round(duration, 4)),
+        ('requests', len(latencies)),
+        ('requests_per_second', round(len(latencies) / duration, 2) if duration else None),
+        ('latency_p50', round(_percentile(latencies, 50) or 0, 3)),
+        ('latency_p99', round(_percentile(latencies, 99) or 0, 3)),
+        ('peak_memory', peak_memory),
+        ('output_bytes', output_bytes),
+    ])
+
+_IMPORT = ('import sys, time; started = time.time(); '
+           'import hawkular_client_cli.command_line; '
+           'print(time.time() - started, len(sys.modules))')
+
+def _wall_time(argv, environ=None):
+    """ Run a command in a new process, returns its run time in seconds
+    """
+    started = time.time()
+    with open(os.devnull, 'w') as devnull:
+        subprocess.call(argv, stdout=devnull, stderr=devnull, env=environ)
+    return time.time() - started
+
+def _median(values):
+    return round(_percentile(values, 50) * 1000.0, 3)
+
+def run_startup(options):
+    """ Measure the cli startup time in new processes, returns a results dict
+
+    Reports median times of starting the interpreter, importing the cli
+    module (measured in the new process) with the number of modules it
+    loads, running hawkular-cli --version and pushing one KEY=VALUE pair.
+    """
+    server = MockServer(latency=options.latency / 1000.0)
+    environ = dict(os.environ, HAWKULAR_URL=server.start(), HAWKULAR_TENANT=_TENANT,
+                   HAWKULAR_USERNAME=_TENANT, HAWKULAR_PASSWORD=_TENANT)
+    cli = [sys.executable, '-m', 'hawkular_client_cli.command_line']
+    times = {'interpreter': [], 'import': [], 'version': [], 'push': []}
+    modules = 0
+    try:
+        for _ in range(options.repeat):
+            times['interpreter'].append(_wall_time([sys.executable, '-c', 'pass']))
+            output = subprocess.check_output([sys.executable, '-c', _IMPORT]).decode('utf-8')
+            import_time, modules = output.split()
+            times['import'].append(float(import_time))
+            times['version'].append(_wall_time(cli + ['--version']))
+            times['push'].append(_wall_time(cli + ['-c', os.devnull, '--no-daemon', '-N',
+                                                   'bench/startup=1'], environ))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return OrderedDict([
+        ('scenario', 'startup'),
+        ('interpreter_ms', _median(times['interpreter'])),
+        ('import_ms', _median(times['import'])),
+        ('modules', int(modules)),
+        ('version_ms', _median(times['version'])),
+        ('push_ms', _median(times['push'])),
+        ('requests', len(server.requests)),
+    ])
+
+def _get_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark hawkular-cli against a local mock Hawkular server.')
+    parser.add_argument('scenarios', metavar='SCENARIO', nargs='*',
+                        default=list(SCENARIOS) + ['startup'],
+                        help='scenarios to run [ {0}, startup ], default all'.format(', '.join(SCENARIOS)))
+    parser.add_argument('--latency', type=float, default=0,
+                        help='mock server latency for each request in milliseconds')
+    parser.add_argument('--keys', type=int, default=1000,
+                        help='number of keys to push, read or tag, and of alert triggers to list')
+    parser.add_argument('--values', type=int, default=10,
+                        help='number of values for each key read by tags, and of alerts for each trigger')
+    parser.add_argument('--points', type=int, default=100000,
+                        help='number of values in the paginated read')
+    parser.add_argument('--rules', type=int, default=500,
+                        help='number of auto-tagging rules')
+    parser.add_argument('--parallel', type=int, default=4,
+                        help='number of concurrent requests')
+    parser.add_argument('--batch-size', dest='batch_size', type=int, default=500,
+                        help='number of metrics in each bulk request')
+    parser.add_argument('--page-size', dest='page_size', type=int, default=1000,
+                        help='number of values in each page read')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of runs of each startup measurement')
+    parser.add_argument('-O', '--output-file', dest='output_file',
+                        help='write results into a file, default stdout')
+    args = parser.parse_args()
+
+    for name in args.scenarios:
+        if name not in SCENARIOS and name != 'startup':
+            parser.error('unknown scenario: {0}'.format(name))
+    return args
+
+def main():
+    args = _get_args()
+    results = OrderedDict([
+        ('version', _VERSION),
+        ('python', platform.python_version()),
+        ('options', OrderedDict((k, getattr(args, k)) for k in
+                                ('latency', 'keys', 'values', 'points', 'rules',
+                                 'parallel', 'batch_size', 'page_size', 'repeat'))),
+        ('results', [run_startup(args) if name == 'startup' else run_scenario(name, args)
+                     for name in args.scenarios]),
+    ])
+
+    text = json.dumps(results, indent=2) + '\n'
+    if args.output_file:
+        with io.open(args.output_file, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import os
+import bisect
+import json
+import time
+import struct
+import sqlite3
+import numbers
+import threading
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'hawkular-client-cli')
+
+def _pack(typecode, values):
+    """ Pack a sequence of int64 (typecode 'q') or float64 ('d') numbers
+    """
+    return struct.pack(str('<{0}{1}').format(len(values), typecode), *values)
+
+def _unpack(typecode, data):
+    """ Unpack a tuple of numbers packed by _pack
+    """
+    data = bytes(data)
+    return struct.unpack(str('<{0}{1}').format(len(data) // 8, typecode), data)
+
+def cache_path(name, create=True):
+    """ Get the path of a file in the cache directory, creating the directory if needed
+    """
+    if create and not os.path.isdir(CACHE_DIR):
+        os.makedirs(CACHE_DIR)
+    return os.path.join(CACHE_DIR, name)
+
+class Cache(object):
+    """ Persistent key value cache stored in a sqlite file
+
+    Entries are grouped by namespace, expire after ttl seconds, and the
+    least recently used entries are evicted when there are more than
+    max_entries entries.
+    """
+    def __init__(self, path, ttl=0, max_entries=1000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('CREATE TABLE IF NOT EXISTS entries ('
+                        'namespace TEXT, key TEXT, value TEXT, created REAL, accessed REAL, '
+                        'PRIMARY KEY (namespace, key))')
+        self.db.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)')
+        self.db.commit()
+
+    def _count(self, name):
+        self.db.execute('INSERT OR IGNORE INTO counters VALUES (?, 0)', (name,))
+        self.db.execute('UPDATE counters SET value = value + 1 WHERE name = ?', (name,))
+
+    def get(self, namespace, key):
+        """ Get a cached value, or None if it is missing or expired
+        """
+        now = time.time()
+        with self.lock:
+            row = self.db.execute('SELECT value, created FROM entries WHERE namespace = ? AND key = ?',
+                                  (namespace, key)).fetchone()
+            if row is None or (self.ttl and now - row[1] > self.ttl):
+                self._count('misses')
+                self.db.commit()
+                return None
+            self.db.execute('UPDATE entries SET accessed = ? WHERE namespace = ? AND key = ?',
+                            (now, namespace, key))
+            self._count('hits')
+            self.db.commit()
+        return json.loads(row[0])
+
+    def put(self, namespace, key, value):
+        """ Store a value, evicting expired and least recently used entries
+        """
+        now = time.time()
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                            (namespace, key, json.dumps(value), now, now))
+            if self.ttl:
+                self.db.execute('DELETE FROM entries WHERE created < ?', (now - self.ttl,))
+            self.db.execute('DELETE FROM entries WHERE rowid IN '
+                            '(SELECT rowid FROM entries ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+                            (self.max_entries,))
+            self.db.commit()
+
+    def invalidate(self, namespace=None):
+        """ Remove all the entries, or only the entries of one namespace
+        """
+        with self.lock:
+            if namespace is None:
+                self.db.execute('DELETE FROM entries')
+            else:
+                self.db.execute('DELETE FROM entries WHERE namespace = ?', (namespace,))
+            self.db.commit()
+
+    def stats(self):
+        """ Get a dict of cache statistics
+        """
+        with self.lock:
+            entries, size = self.db.execute('SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) '
+                                            'FROM entries').fetchone()
+            counters = dict(self.db.execute('SELECT name, value FROM counters').fetchall())
+        return {'path': self.path,
+                'entries': entries,
+                'bytes': size,
+                'hits': counters.get('hits', 0),
+                'misses': counters.get('misses', 0)}
+
+    def close(self):
+        self.db.close()
+
+class DatapointCache(object):
+    """ Persistent cache of numeric datapoints stored in a sqlite file
+
+    Each key holds one segment of datapoints covering the time range
+    [start, end), timestamps are stored as packed int64 numbers, and values
+    as packed int64 numbers if they are all integers (e.g. counters), or
+    float64 numbers, so cached values read like values from the server.
+    Reading a range fetches only the parts of it that are not covered by
+    the cached segment.
+
+    The last settle milliseconds before now are never cached, because
+    late datapoints may still arrive for them.
+    """
+    def __init__(self, path, max_keys=1000, settle=60000):
+        self.path = path
+        self.max_keys = max_keys
+        self.settle = settle
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('CREATE TABLE IF NOT EXISTS datapoints ('
+                        'namespace TEXT, key TEXT, start INTEGER, end INTEGER, '
+                        'timestamps BLOB, "values" BLOB, typecode TEXT, accessed REAL, '
+                        'PRIMARY KEY (namespace, key))')
+        self.db.commit()
+
+    def _load(self, namespace, key):
+        with self.lock:
+            row = self.db.execute('SELECT start, end, timestamps, "values", typecode FROM datapoints '
+                                  'WHERE namespace = ? AND key = ?', (namespace, key)).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], _unpack('q', row[2]), _unpack(row[4], row[3])
+
+    def _store(self, namespace, key, start, end, timestamps, values):
+        integral = all(isinstance(v, numbers.Integral) and not isinstance(v, bool) for v in values)
+        typecode = 'q' if integral else 'd'
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO datapoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                            (namespace, key, start, end, sqlite3.Binary(_pack('q', timestamps)),
+                             sqlite3.Binary(_pack(typecode, values)), typecode, time.time()))
+            self.db.execute('DELETE FROM datapoints WHERE rowid IN '
+                            '(SELECT rowid FROM datapoints ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+                            (self.max_keys,))
+            self.db.commit()
+
+    def _touch(self, namespace, key):
+        with self.lock:
+            self.db.execute('UPDATE datapoints SET accessed = ? WHERE namespace = ? AND key = ?',
+                            (time.time(), namespace, key))
+            self.db.commit()
+
+    def read(self, namespace, key, start, end, fetch):
+        """ Get the datapoints of a key in [start, end) as a list of
+        (timestamp, value) tuples, oldest first
+
+        fetch(start, end) must return all the datapoints of the key in the
+        range [start, end), it is called only for ranges missing from the cache.
+        The cached segment of the key is replaced by the requested range, so
+        it never grows beyond the range of the last read that fetched data.
+        """
+        segment = self._load(namespace, key)
+        if segment and start <= segment[1] and end >= segment[0]:
+            cached_start, cached_end, timestamps, values = segment
+            low = bisect.bisect_left(timestamps, start)
+            high = bisect.bisect_left(timestamps, end)
+            head = self._fetch(fetch, start, cached_start) if start < cached_start else []
+            tail = self._fetch(fetch, cached_end, end) if end > cached_end else []
+            points = head + list(zip(timestamps[low:high], values[low:high])) + tail
+            if not head and not tail:
+                self._touch(namespace, key)
+                return points
+        else:
+            points = self._fetch(fetch, start, end)
+
+        # Keep the unsettled end of the range out of the cache
+        covered_end = min(end, int(time.time() * 1000) - self.settle)
+        if covered_end > start:
+            settled = [p for p in points if p[0] < covered_end]
+            self._store(namespace, key, start, covered_end,
+                        [t for t, _ in settled], [v for _, v in settled])
+
+        return points
+
+    def invalidate(self):
+        """ Remove all the cached datapoints
+        """
+        with self.lock:
+            self.db.execute('DELETE FROM datapoints')
+            self.db.commit()
+
+    @staticmethod
+    def _fetch(fetch, start, end):
+        points = dict((int(v.get('timestamp')), v.get('value')) for v in fetch(start, end))
+        return [(t, points[t]) for t in sorted(points) if start <= t < end]
+
+    def stats(self):
+        """ Get a dict of cache statistics
+        """
+        with self.lock:
+            keys, points = self.db.execute('SELECT COUNT(*), COALESCE(SUM(LENGTH(timestamps)), 0) '
+                                           'FROM datapoints').fetchone()
+        return {'path': self.path, 'keys': keys, 'datapoints': points // 8}
+
+    def close(self):
+        self.db.close()
@@ -23,22 +23,42 @@ _DESCRIPTION = 'Read/Write data to and from a Hawkular metric server.'
 
 import os
 import sys
-import re
-import ssl
+import socket
 import argparse
-import yaml
 import time
+import itertools
+import json
+import copy
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from dateutil.parser import *
-from future.moves.urllib.parse import urlparse
-from hawkular.metrics import HawkularMetricsClient, MetricType
-try:
-    from hawkular import HawkularAlertsClient
-except Exception as err:
-    # alert client is not implemented in regular lib (it's ok to fail here)
-    pass
+from hawkular_client_cli.spool import Spool
+from hawkular_client_cli.parallel import ordered_map
+from hawkular_client_cli.rules import RuleSet
+from hawkular_client_cli.aggregate import STATS, check_stats, to_arrays, aggregate
+from hawkular_client_cli.daemon import Daemon, forward
+from hawkular_client_cli.cache import Cache, DatapointCache, cache_path
+from hawkular_client_cli.output import FORMATS, RecordWriter, get_writer, timestr
+from hawkular_client_cli.trace import Tracer, TRACE_FORMATS
+
+# yaml, dateutil, hawkular (and the modules using it) are slow to import, and
+# are imported only when a command needs them, to keep startup fast
+
+# Values arriving later than this (in milliseconds) may be missed by --follow
+FOLLOW_LATENESS = 60000
+
+# Max number of keys in the id filter of one definitions request
+ID_FILTER_SIZE = 100
+
+# Number of new keys pushed from a file between tag updates
+TAG_KEYS = 10000
+
+# Arguments holding file or directory paths
+PATH_ARGS = ['config_file', 'spool', 'push_file', 'export_dir', 'import_dir', 'snapshot',
+             'offline', 'output_file', 'socket', 'trace_out']
 
 def valid_date(s):
+    from dateutil.parser import parse
+
     try:
         return parse(s)
     except ValueError:
@@ -49,11 +69,33 @@ def total_milisecond(t):
     return time.mktime(t.timetuple())*1e3
 
 class CommandLine(object):
-    def __init__(self):
-        self._get_args()
-        self._get_config()
-        self._get_args()
-        self._get_client()
+    def __init__(self, argv=None, environ=None, shared=None, cwd=None):
+        """ Parse arguments, config and connect to the server
+
+        argv defaults to the process arguments, and environ to the process
+        environment. shared is a dict used to share parsed config files and
+        connected clients between command lines running in one process.
+        Relative paths in arguments are relative to cwd, if given.
+        """
+        self.cache = None
+        self.data_cache = None
+        self.rules = None
+        self.environ = os.environ if environ is None else environ
+        self.shared = shared
+        self.cwd = cwd
+
+        started = time.time()
+        self._get_args(argv)
+        self.tracer = Tracer(enabled=self.args.profile or bool(self.args.trace_out), start=started)
+        self.tracer.add('args', 'phase', started, time.time())
+
+        self._run_daemon(argv)
+        with self.tracer.span('config'):
+            self._get_config()
+        with self.tracer.span('client'):
+            self._get_client()
+        self.tracer.instrument(self.client)
+        self.tracer.instrument(self.alert_client)
 
     def log(self, *args):
         """ Pring logs
@@ -62,7 +104,7 @@ class CommandLine(object):
             print(*args)
 
     # Read cli arguments
-    def _get_args(self):
+    def _get_args(self, argv=None):
         """ Get and parse command lint arguments
         """
         parser = argparse.ArgumentParser(description=_DESCRIPTION)
@@ -75,6 +117,10 @@ class CommandLine(object):
         parser.add_argument('-c', '--config', dest='config_file', type=str, nargs='?',
                             default='/etc/hawkular-client-cli/conifg.yaml',
                             help='Configurations file path')
+        parser.add_argument('--all-tenants', dest='all_tenants', action='store_true',
+                            help='list, read or query statistics in all the tenants')
+        parser.add_argument('--tenant-list', dest='tenant_list', metavar='TENANT', type=str, nargs='+',
+                            help='list, read or query statistics in a list of tenants')
         parser.add_argument('-p', '--password', dest='password', type=str, nargs='?',
                             help='Hawkualr server password')
         parser.add_argument('-T', '--token', dest='token', type=str, nargs='?',
@@ -105,12 +151,78 @@ class CommandLine(object):
         parser.add_argument('-b', "--bucketDuration", dest='bucketDuration', type=int, nargs='?',
                             default=0,
                             help="the metrics atatistics reading bucket duration in secondes")
+        parser.add_argument('-A', '--aggregate', metavar='STAT', dest='aggregate', type=str, nargs='+',
+                            help='aggregate raw values on the client in --bucketDuration buckets [{0}] '
+                                 '(requires numpy)'.format(', '.join(STATS + ['pNN'])))
+        parser.add_argument('-G', '--group-by', metavar='TAG', dest='group_by', type=str,
+                            help='aggregate the values of keys with the same TAG value together')
+        parser.add_argument('-f', '--follow', action='store_true',
+                            help='after reading, keep polling for new values and print them as they arrive')
+        parser.add_argument('--interval', dest='interval', metavar='SECONDS', type=float,
+                            default=10.0,
+                            help='time between polls when following new values (default 10)')
         parser.add_argument('--limit', dest='limit', type=int, nargs='?',
                             default=10,
-                            help='limit for metrics reading')
+                            help='limit for metrics reading (0 for no limit)')
+        parser.add_argument('--page-size', dest='page_size', type=int, nargs='?',
+                            default=1000,
+                            help='max number of values in a single read request')
+        parser.add_argument('--retries', dest='retries', metavar='N', type=int,
+                            default=3,
+                            help='number of times to retry a failed push (default 3)')
+        parser.add_argument('--flush-interval', dest='flush_interval', metavar='SECONDS', type=float,
+                            default=5.0,
+                            help='max time to buffer streamed values before pushing them (default 5)')
+        parser.add_argument('--spool', dest='spool', metavar='FILE', type=str,
+                            help='append values that could not be pushed to FILE, and push them later')
+        parser.add_argument('--spool-size', dest='spool_size', metavar='MB', type=int,
+                            default=100,
+                            help='max size of the spool file in MB (default 100)')
+        parser.add_argument('-j', '--parallel', dest='parallel', metavar='N', type=int,
+                            default=1,
+                            help='max number of concurrent read requests (default 1)')
+        parser.add_argument('--timeout', dest='timeout', metavar='SECONDS', type=float,
+                            help='timeout in seconds for each server request')
         parser.add_argument('-S', "--time", dest='data_time', type=valid_date,
                             default=datetime.now(),
                             help="override time value timestamp (default is now)")
+        parser.add_argument('--batch-size', dest='batch_size', type=int, nargs='?',
+                            help='max number of metrics in a single push or query request (0 for no limit)')
+        parser.add_argument('-P', '--push-file', dest='push_file', metavar='FILE', type=str,
+                            help='push "key value [timestamp] [type]" or JSON lines from a file (- for stdin)')
+        parser.add_argument('--export', dest='export_dir', metavar='DIR', type=str,
+                            help='export metric definitions and data (between --start and --end) into a directory')
+        parser.add_argument('--import', dest='import_dir', metavar='DIR', type=str,
+                            help='import metric definitions and data exported into a directory')
+        parser.add_argument('--chunk-size', dest='chunk_size', metavar='N', type=int, default=100,
+                            help='number of keys in each exported data file (default 100)')
+        parser.add_argument('--snapshot', dest='snapshot', metavar='FILE', type=str,
+                            help='save metric data (between --start and --end) of keys or tags into a snapshot file')
+        parser.add_argument('--offline', dest='offline', metavar='FILE', type=str,
+                            help='list and read metrics from a snapshot file instead of a server')
+        parser.add_argument('-o', '--output', choices=FORMATS, default='text',
+                            help='output format [text, csv, jsonl, parquet]')
+        parser.add_argument('-O', '--output-file', dest='output_file', metavar='FILE', type=str,
+                            help='write output to a file (default is stdout)')
+        parser.add_argument('--timestr', action='store_true',
+                            help='add a time string column to csv, jsonl and parquet output')
+        parser.add_argument('--cache-ttl', dest='cache_ttl', metavar='SECONDS', type=int,
+                            help='cache metric definitions locally for SECONDS (default 0, no caching)')
+        parser.add_argument('--cache-size', dest='cache_size', metavar='N', type=int,
+                            default=1000,
+                            help='max number of entries in the local cache')
+        parser.add_argument('--data-cache', dest='data_cache', action='store_true',
+                            help='cache gauge and counter values locally, and read only missing time ranges')
+        parser.add_argument('--cache-clear', dest='cache_clear', action='store_true',
+                            help='remove all the entries from the local cache')
+        parser.add_argument('--cache-stats', dest='cache_stats', action='store_true',
+                            help='print local cache statistics')
+        parser.add_argument('--daemon', action='store_true',
+                            help='run as a daemon, serving push and read commands on a unix socket')
+        parser.add_argument('--socket', dest='socket', metavar='PATH', type=str,
+                            help='daemon unix socket path (default ~/.cache/hawkular-client-cli/daemon.sock)')
+        parser.add_argument('--no-daemon', dest='no_daemon', action='store_true',
+                            help='do not forward commands to a running daemon')
         parser.add_argument('--auto-api', action='store_true',
                             help='check api version before query server')
         parser.add_argument('-V', '--verbose', action='store_true',
@@ -119,49 +231,139 @@ class CommandLine(object):
                             help='query hawkular status')
         parser.add_argument('--triggers', action='store_true',
                             help='query hawkular alert triggers')
+        parser.add_argument('--trigger-ids', dest='trigger_ids', metavar='ID', type=str, nargs='+',
+                            help='query only alert triggers with these ids')
+        parser.add_argument('--trigger-state', dest='trigger_state', choices=['enabled', 'disabled'],
+                            help='query only enabled or disabled alert triggers')
+        parser.add_argument('--trigger-details', dest='trigger_details', action='store_true',
+                            help='also query conditions and alerts (between --start and --end) of alert triggers')
         parser.add_argument('-N', '--no-autotags', dest='no_autotags', action='store_true',
                             help='do not update tags using the config file')
+        parser.add_argument('--profile', action='store_true',
+                            help='print a table of time spent in each phase and request type')
+        parser.add_argument('--trace-out', dest='trace_out', metavar='FILE',
+                            help='write timing spans of phases and requests into a file')
+        parser.add_argument('--trace-format', dest='trace_format', choices=TRACE_FORMATS,
+                            default='chrome',
+                            help='trace file format [chrome, otel] (default chrome)')
         parser.add_argument('-v', '--version', action='store_true',
                             help='print version')
-        args = parser.parse_args()
+        args = parser.parse_args(argv)
 
         if args.version:
             print('hawkular-cli v' + _VERSION + '\n')
             sys.exit(1)
 
-        self.metric_type = {'gauge': MetricType.Gauge,
-                            'counter': MetricType.Counter,
-                            'string': MetricType.String,
-                            'availability': MetricType.Availability}[args.metric]
+        if args.follow and (args.all_tenants or args.tenant_list):
+            parser.error('--follow can not be used with --all-tenants or --tenant-list')
+        if args.offline and (args.values or args.push_file or args.import_dir or args.export_dir or
+                             args.snapshot or args.follow or args.data_cache or
+                             args.all_tenants or args.tenant_list):
+            parser.error('--offline can only be used to list and read metrics')
+
+        from hawkular_client_cli.push import DEFAULT_BATCH_SIZE
+        from hawkular_client_cli.ingest import METRIC_TYPES
+
+        if args.batch_size is None:
+            args.batch_size = DEFAULT_BATCH_SIZE
+        self.metric_type = METRIC_TYPES[args.metric]
+
+        # A daemon runs commands sent from other directories
+        if self.cwd is not None:
+            for name in PATH_ARGS:
+                path = getattr(args, name)
+                if path and path != '-':
+                    setattr(args, name, os.path.join(self.cwd, path))
 
         self.parser = parser
         self.args = args
 
+    # Run as a daemon, or forward commands to a running daemon
+    def _run_daemon(self, argv):
+        """ Serve commands on a unix socket, or forward this command to a running daemon
+        """
+        if self.args.daemon:
+            path = self.args.socket or cache_path('daemon.sock', create=False)
+            self.log('Daemon listening on', path)
+            daemon = Daemon(path, CommandLine, log=self.log)
+            try:
+                daemon.serve()
+            except KeyboardInterrupt:
+                pass
+            sys.exit(0)
+
+        # Only push and bounded read commands are forwarded, the daemon returns
+        # output when a command ends, so stdin, followed and paged reads are run
+        # in this process, and profiled commands are timed in this process
+        forwardable = (self.args.read and not self.args.follow and not self._is_paged()) or \
+            self.args.values or \
+            (self.args.push_file and self.args.push_file != '-')
+        profiled = self.args.profile or self.args.trace_out
+        if self.shared is not None or self.args.no_daemon or not forwardable or profiled:
+            return
+
+        # Forwarding only checks for a socket file, and never creates the cache directory
+        path = self.args.socket or cache_path('daemon.sock', create=False)
+        result = forward(path, sys.argv[1:] if argv is None else argv)
+        if result is not None:
+            status, output, error = result
+            sys.stdout.write(output)
+            sys.stderr.write(error)
+            sys.exit(status)
+
     # Read config file
     def _get_config(self):
         """ Get and parse config file parameters
         """
         config = {}
         if os.path.exists(self.args.config_file):
-            self.log('Reading config file', self.args.config_file)
-            config = yaml.load(open(self.args.config_file))
+            # A daemon parses each config file once, until it is modified
+            configs = self.shared.setdefault('configs', {}) if self.shared is not None else {}
+            index = (self.args.config_file, os.path.getmtime(self.args.config_file))
+            if index not in configs:
+                configs[index] = self._load_config(self.args.config_file)
+            config = dict(configs[index] or {})
         config['hawkular'] = config.get('hawkular', {})
         config['tags'] = config.get('tags', [])
 
         self.config = config
 
+    def _load_config(self, path):
+        """ Parse a yaml config file
+        """
+        import yaml
+
+        self.log('Reading config file', path)
+        with open(path) as f:
+            return yaml.safe_load(f)
+
     # Get Hawkular server and credentials
     def _get_client(self):
         """ Create a Hawkular metrics client
         """
-        url = self.args.url or os.environ.get('HAWKULAR_URL') or self.config.get('hawkular').get('url')
-        tenant = self.args.tenant or os.environ.get('HAWKULAR_TENANT') or self.config.get('hawkular').get('tenant')
-        token = self.args.token or os.environ.get('HAWKULAR_TOKEN') or self.config.get('hawkular').get('token')
-        username = self.args.username or os.environ.get('HAWKULAR_USERNAME') or self.config.get('hawkular').get('username')
-        password = self.args.password or os.environ.get('HAWKULAR_PASSWORD') or self.config.get('hawkular').get('password')
+        if self.args.offline:
+            return self._get_offline_client()
+
+        import ssl
+        from future.moves.urllib.parse import urlparse
+        from hawkular.metrics import HawkularMetricsClient
+        from hawkular_client_cli.connection import KeepAliveMetricsClient
+        try:
+            from hawkular import HawkularAlertsClient
+        except Exception as err:
+            # alert client is not implemented in regular lib (it's ok to fail here)
+            HawkularAlertsClient = None
+
+        url = self.args.url or self.environ.get('HAWKULAR_URL') or self.config.get('hawkular').get('url')
+        tenant = self.args.tenant or self.environ.get('HAWKULAR_TENANT') or self.config.get('hawkular').get('tenant') or \
+            (self.args.tenant_list or [None])[0]
+        token = self.args.token or self.environ.get('HAWKULAR_TOKEN') or self.config.get('hawkular').get('token')
+        username = self.args.username or self.environ.get('HAWKULAR_USERNAME') or self.config.get('hawkular').get('username')
+        password = self.args.password or self.environ.get('HAWKULAR_PASSWORD') or self.config.get('hawkular').get('password')
         insecure = self.args.insecure or self.config.get('hawkular').get('insecure') or False
         auto_api = self.args.auto_api or self.config.get('hawkular').get('auto_api') or False
         context = ssl._create_unverified_context() if insecure else None
+        timeout = self.args.timeout or self.config.get('hawkular').get('timeout')
 
         if not url:
             print('Error: missing url\n')
@@ -180,27 +382,118 @@ class CommandLine(object):
             self.parser.print_help()
             sys.exit(1)
 
+        # The hawkular client does not pass a timeout to urlopen, so it uses the socket
+        # default, a daemon keeps running, so its kept alive clients get the timeout instead
+        if timeout and self.shared is None:
+            socket.setdefaulttimeout(timeout)
+
+        # A daemon keeps one connected client for each server, credentials and timeout
+        clients = self.shared.setdefault('clients', {}) if self.shared is not None else {}
+        index = (url, tenant, token, username, password, insecure, auto_api, timeout)
+        if index in clients:
+            self.client, self.alert_client = clients[index]
+        else:
+            # Tenant clients of --all-tenants and --tenant-list share the kept alive connections
+            keep_alive = self.shared is not None or self._is_fan_out()
+            metrics_client = KeepAliveMetricsClient if keep_alive else HawkularMetricsClient
+            try:
+                url_args = urlparse(url)
+                client = metrics_client(host=url_args.hostname, port=url_args.port, token=token,
+                                        scheme=url_args.scheme, username=username, password=password,
+                                        tenant_id=tenant, context=context, auto_set_legacy_api=auto_api,
+                                        **({'timeout': timeout} if keep_alive else {}))
+                self.log('Connectd:', url_args.hostname, tenant, url_args.scheme, url_args.hostname, url_args.port)
+            except Exception as err:
+                print('[ERROR] Not Connectd:', url_args.hostname, tenant, url_args.scheme, url_args.hostname, url_args.port)
+                print(err, '\n')
+                self.parser.print_help()
+                sys.exit(1)
+
+            self.alert_client = None
+            try:
+                self.alert_client = HawkularAlertsClient(host=url_args.hostname, port=url_args.port, token=token,
+                                               scheme=url_args.scheme, username=username, password=password,
+                                               tenant_id=tenant, context=context, auto_set_legacy_api=auto_api)
+            except Exception as err:
+                # alert client is not implemented in regular lib (it's ok to fail here)
+                pass
+
+            self.client = client
+            clients[index] = (self.client, self.alert_client)
+        self.url = url
+        self.tenant = tenant
+        self.cache_ttl = self.args.cache_ttl
+        if self.cache_ttl is None:
+            self.cache_ttl = self.config.get('hawkular').get('cache_ttl') or 0
+
+    def _get_offline_client(self):
+        """ Create a client reading a snapshot file
+        """
+        from hawkular_client_cli.snapshot import SnapshotClient
+
         try:
-            url_args = urlparse(url)
-            client = HawkularMetricsClient(host=url_args.hostname, port=url_args.port, token=token,
-                                           scheme=url_args.scheme, username=username, password=password,
-                                           tenant_id=tenant, context=context, auto_set_legacy_api=auto_api)
-            self.log('Connectd:', url_args.hostname, tenant, url_args.scheme, url_args.hostname, url_args.port)
+            self.client = SnapshotClient(self.args.offline)
         except Exception as err:
-            print('[ERROR] Not Connectd:', url_args.hostname, tenant, url_args.scheme, url_args.hostname, url_args.port)
             print(err, '\n')
-            self.parser.print_help()
             sys.exit(1)
+        self.alert_client = None
+        self.url = 'file://' + os.path.abspath(self.args.offline)
+        self.tenant = self.client.tenant_id
+        self.cache_ttl = 0
 
-        try:
-            self.alert_client = HawkularAlertsClient(host=url_args.hostname, port=url_args.port, token=token,
-                                           scheme=url_args.scheme, username=username, password=password,
-                                           tenant_id=tenant, context=context, auto_set_legacy_api=auto_api)
-        except Exception as err:
-            # alert client is not implemented in regular lib (it's ok to fail here)
-            pass
+    def _get_cache(self):
+        """ Open the local cache
+        """
+        if self.cache is None:
+            self.cache = Cache(cache_path('cache.sqlite'), self.cache_ttl, self.args.cache_size)
+        return self.cache
+
+    def _definitions_namespace(self):
+        """ Get the cache namespace of metric definitions for this server and tenant
+        """
+        return 'definitions:{0}:{1}'.format(self.url, self.tenant)
 
-        self.client = client
+    def _query_definitions(self, tags, metric_type=None, id_filter=None):
+        """ Get metric definitions matching tags, using the local cache if enabled
+
+        Without tags, id_filter is a list of keys joined by '|'.
+        """
+        metric_type = metric_type or self.metric_type
+        with self.tracer.span('definitions', cached=False) as attributes:
+            if not self.cache_ttl:
+                definitions = self.client.query_metric_definitions(metric_type=metric_type,
+                                                                   id_filter=id_filter, **tags) or []
+                attributes['definitions'] = len(definitions)
+                return definitions
+
+            cache = self._get_cache()
+            key = json.dumps([metric_type, tags] + ([id_filter] if id_filter else []), sort_keys=True)
+            definitions = cache.get(self._definitions_namespace(), key)
+            if definitions is None:
+                definitions = self.client.query_metric_definitions(metric_type=metric_type,
+                                                                   id_filter=id_filter, **tags) or []
+                cache.put(self._definitions_namespace(), key, definitions)
+            else:
+                self.log('Using cached definitions:', key)
+                attributes['cached'] = True
+            attributes['definitions'] = len(definitions)
+            return definitions
+
+    def _print_cache_stats(self):
+        """ Print local cache statistics
+        """
+        stats = self._get_cache().stats()
+        print('cache:', stats['path'])
+        print('entries:', stats['entries'], '(', stats['bytes'], 'bytes )')
+        print('hits:', stats['hits'])
+        print('misses:', stats['misses'])
+        print()
+
+        if self.data_cache:
+            stats = self.data_cache.stats()
+            print('data cache:', stats['path'])
+            print('keys:', stats['keys'], '(', stats['datapoints'], 'datapoints )')
+            print()
 
     def _query_status(self):
         """ Query Hawkular server status
@@ -209,173 +502,655 @@ class CommandLine(object):
         print(status)
         print()
 
+    def _fetch_trigger_details(self, trigger):
+        """ Get the conditions and newest alerts of an alert trigger, using the local cache if enabled
+        """
+        from hawkular_client_cli.triggers import query_trigger_conditions, query_trigger_alerts
+
+        start = int(total_milisecond(self.args.start))
+        end = int(total_milisecond(self.args.end))
+        limit = self.args.limit if self.args.limit > 0 else self.args.page_size
+
+        # Time ranges are matched to the minute, so polling reuses cached details
+        namespace = 'triggers:{0}:{1}'.format(self.url, self.tenant)
+        key = json.dumps([trigger.get('id'), start // 60000, end // 60000, limit])
+        details = self._get_cache().get(namespace, key) if self.cache_ttl else None
+        if details is None:
+            details = {'conditions': query_trigger_conditions(self.alert_client, trigger.get('id')),
+                       'alerts': query_trigger_alerts(self.alert_client, trigger.get('id'),
+                                                      start, end, limit)}
+            if self.cache_ttl:
+                self._get_cache().put(namespace, key, details)
+        return trigger, details
+
     def _query_triggers(self):
         """ Query Hawkular server alerts
         """
-        triggers = self.alert_client.list_triggers()
-        for trigger in triggers:
-            print('key: ', trigger.id)
-            print('name:', trigger.name)
-            print('description:', trigger.description)
-            print('enabled:', trigger.enabled)
-            print()
+        from hawkular_client_cli.triggers import iter_trigger_pages
+
+        if self.alert_client is None:
+            raise ValueError('Querying triggers requires hawkular-client-python >= 0.4.5')
+
+        tags = dict([i.split("=")[0], i.split("=")[1]] for i in self.args.tags) if self.args.tags else {}
+        pages = iter_trigger_pages(self.alert_client, self.args.trigger_ids, tags, self.args.page_size)
+        for page in pages:
+            # The triggers endpoint does not filter by state
+            triggers = [t for t in page if not self.args.trigger_state or
+                        bool(t.get('enabled')) == (self.args.trigger_state == 'enabled')]
+            if self.args.trigger_details:
+                pairs = ordered_map(self._fetch_trigger_details, triggers, self.args.parallel)
+            else:
+                pairs = ((trigger, None) for trigger in triggers)
+
+            for trigger, details in pairs:
+                print('key: ', trigger.get('id'))
+                print('name:', trigger.get('name'))
+                print('description:', trigger.get('description'))
+                print('enabled:', trigger.get('enabled'))
+                print('tags:', trigger.get('tags') or {})
+                if details is not None:
+                    print('conditions:')
+                    for condition in details['conditions']:
+                        print('    ', condition.get('triggerMode'), condition.get('type'),
+                              condition.get('dataId'), condition.get('operator'), condition.get('threshold'))
+                    print('alerts:')
+                    for alert in details['alerts']:
+                        print('    ', alert.get('ctime'), '(', timestr(alert.get('ctime')), ')',
+                              alert.get('severity'), alert.get('status'))
+                print()
+            sys.stdout.flush()
 
     def _query_metric_definitions(self):
         """ Get a list of metric definitions
         """
         tags = dict([i.split("=")[0], i.split("=")[1]] for i in self.args.tags) if self.args.tags else {}
-        definitions = self.client.query_metric_definitions(metric_type=self.metric_type, **tags)
-        for definition in definitions:
-            print('key: ', definition.get('id'))
-            print('tags:', definition.get('tags') or {})
-            print()
+        definitions = self._query_definitions(tags)
+        self.output.write_definitions(definitions)
 
     def _query_tenants(self):
         """ Get a list of tenants
         """
-        definitions = self.client.query_tenants()
-        for definition in definitions:
-            print('id: ', definition.get('id'))
+        tenants = self.client.query_tenants()
+        self.output.write_tenants(tenants or [])
 
-    def _query_metric_stats_by_keys(self):
-        """ get meric data
+    def _is_fan_out(self):
+        """ Check if queries run in many tenants
+        """
+        return self.args.all_tenants or bool(self.args.tenant_list)
+
+    def _get_tenants(self):
+        """ Get the tenants of the --tenant-list argument, or all the tenants for --all-tenants
+        """
+        if self.args.tenant_list:
+            return self.args.tenant_list
+        return [tenant.get('id') for tenant in self.client.query_tenants() or []]
+
+    def _tenant_command(self, tenant):
+        """ Get a copy of this command line that queries another tenant
+
+        The client of the copy shares the connections of this client, the
+        output of the copy is kept in memory, and the copy reads keys one at
+        a time, tenants are the ones read concurrently.
+        """
+        command = copy.copy(self)
+        command.args = copy.copy(self.args)
+        command.args.parallel = 1
+        command.client = copy.copy(self.client)
+        # Drop a request tracer bound to this client
+        command.client.__dict__.pop('_http', None)
+        command.client.tenant_id = tenant
+        command.tracer.instrument(command.client)
+        command.tenant = tenant
+        command.output = RecordWriter()
+        return command
+
+    def _for_tenants(self, action):
+        """ Run a query method in this tenant, or in each tenant of --all-tenants and --tenant-list
+
+        Tenants are queried concurrently using up to --parallel workers, the
+        output of each tenant is written in tenants order, tagged by tenant.
+        """
+        if not self._is_fan_out():
+            return getattr(self, action)()
+
+        def run(tenant):
+            command = self._tenant_command(tenant)
+            try:
+                getattr(command, action)()
+            except Exception as err:
+                return tenant, None, err
+            return tenant, command.output, None
+
+        failed = 0
+        try:
+            for tenant, records, err in ordered_map(run, self._get_tenants(), self.args.parallel):
+                if err is not None:
+                    print('[ERROR] Tenant failed:', tenant, err)
+                    failed += 1
+                    continue
+                self.output.tenant = tenant
+                records.replay(self.output)
+        finally:
+            self.output.tenant = None
+
+        if failed:
+            raise ValueError('Queries failed in {0} tenants'.format(failed))
+
+    def _get_definition_keys(self):
+        """ Get the keys of metric definitions matching the tags argument
+        """
+        tags = dict([i.split("=")[0], i.split("=")[1]] for i in self.args.tags) if self.args.tags else {}
+        definitions = self._query_definitions(tags)
+        return [definition.get('id') for definition in definitions]
+
+    def _is_paged(self):
+        """ Check if reading needs more than one page of values per key
+        """
+        return self.args.limit <= 0 or self.args.limit > self.args.page_size
+
+    def _fetch_cached_metric(self, key):
+        """ Get meric data for one key, reading only time ranges missing from the local cache
+        """
+        from hawkular_client_cli.query import iter_metric
+
+        def fetch(start, end):
+            return iter_metric(self.client, self.metric_type, key, start, end,
+                               page_size=self.args.page_size)
+
+        namespace = '{0}:{1}:{2}'.format(self.url, self.tenant, self.metric_type)
+        points = self.data_cache.read(namespace, key,
+            int(total_milisecond(self.args.start)),
+            int(total_milisecond(self.args.end)),
+            fetch)
+
+        # Newest values first, like values read from the server
+        points.reverse()
+        if self.args.limit > 0:
+            points = points[:self.args.limit]
+        return key, [{'timestamp': t, 'value': v} for t, v in points]
+
+    def _fetch_metric(self, key):
+        """ Get meric data for one key
         """
-        for key in self.args.keys:
-            print('key:', key)
-            values = self.client.query_metric_stats(self.metric_type, key,
+        from hawkular_client_cli.query import iter_metric
+
+        if self.data_cache:
+            return self._fetch_cached_metric(key)
+
+        if self._is_paged():
+            # Values are read lazily, page by page, while they are printed
+            values = iter_metric(self.client, self.metric_type, key,
                 start=int(total_milisecond(self.args.start)),
                 end=int(total_milisecond(self.args.end)),
-                bucketDuration="{0}s".format(self.args.bucketDuration),
-                limit=self.args.limit)
-            print('values:')
-            for value in values:
-                timestamp = value.get('start')
-                timestr = datetime.fromtimestamp(timestamp / 1000).strftime('%Y-%m-%d %H:%M:%S')
-                print ('    ', timestamp, '(', timestr, ') avg:', value.get('avg'), '[',value.get('samples'), ']')
-            print()
+                limit=max(self.args.limit, 0),
+                page_size=self.args.page_size)
+            if self.args.parallel > 1:
+                # Fetch in this worker, not while printing in the main thread: all the
+                # values of a limited read, or the first page of an unlimited one
+                size = self.args.limit if self.args.limit > 0 else self.args.page_size
+                values = itertools.chain(list(itertools.islice(values, size)), values)
+            return key, values
+
+        values = self.client.query_metric(self.metric_type, key,
+            start=int(total_milisecond(self.args.start)),
+            end=int(total_milisecond(self.args.end)),
+            limit=self.args.limit)
+        return key, values
+
+    def _fetch_metric_stats(self, key):
+        """ Get meric statistics for one key
+        """
+        values = self.client.query_metric_stats(self.metric_type, key,
+            start=int(total_milisecond(self.args.start)),
+            end=int(total_milisecond(self.args.end)),
+            bucketDuration="{0}s".format(self.args.bucketDuration),
+            **({'limit': self.args.limit} if self.args.limit > 0 else {}))
+        return key, values
+
+    def _fetch_metric_batch(self, keys):
+        """ Get meric data for a list of keys using one request
+        """
+        from hawkular_client_cli.query import query_metrics
+
+        values = query_metrics(self.client, self.metric_type, keys,
+            start=int(total_milisecond(self.args.start)),
+            end=int(total_milisecond(self.args.end)),
+            limit=self.args.limit)
+        if values is None:
+            return None
+        return [(key, values.get(key) or []) for key in keys]
+
+    def _fetch_metric_stats_batch(self, keys):
+        """ Get meric statistics for a list of keys using one request
+        """
+        from hawkular_client_cli.query import query_metrics_stats
+
+        values = query_metrics_stats(self.client, self.metric_type, keys,
+            start=int(total_milisecond(self.args.start)),
+            end=int(total_milisecond(self.args.end)),
+            bucketDuration="{0}s".format(self.args.bucketDuration))
+        if values is None:
+            return None
+        return [(key, values.get(key) or []) for key in keys]
+
+    def _read(self, keys, fetch_batch, fetch):
+        """ Yield (key, values) pairs for a list of keys, in keys order
+
+        Servers that support multi metric queries get one request per batch of
+        keys, older servers (or a fetch_batch of None) get one request per key.
+        """
+        from hawkular_client_cli.push import chunks
+
+        if fetch_batch and not self.client.legacy_api:
+            batches = list(chunks(keys, self.args.batch_size))
+            first = fetch_batch(batches[0]) if batches else []
+            if first is not None:
+                for pair in first:
+                    yield pair
+                for pairs in ordered_map(fetch_batch, batches[1:], self.args.parallel):
+                    for pair in pairs:
+                        yield pair
+                return
+            self.log('Multi metric query is not supported, reading keys one by one')
+
+        for pair in ordered_map(fetch, keys, self.args.parallel):
+            yield pair
+
+    def _fetch_metric_arrays(self, key):
+        """ Get all the meric data of one key as arrays
+        """
+        from hawkular_client_cli.query import iter_metric
+
+        values = iter_metric(self.client, self.metric_type, key,
+            start=int(total_milisecond(self.args.start)),
+            end=int(total_milisecond(self.args.end)),
+            page_size=self.args.page_size)
+        return key, to_arrays(list(values))
+
+    def _query_metric_aggregates(self, keys):
+        """ Get meric data and aggregate it on the client
+        """
+        stats = self.args.aggregate
+        check_stats(stats)
+        start = int(total_milisecond(self.args.start))
+        end = int(total_milisecond(self.args.end))
+        bucket = self.args.bucketDuration * 1000
+
+        pairs = ordered_map(self._fetch_metric_arrays, keys, self.args.parallel)
+        if not self.args.group_by:
+            for key, series in pairs:
+                self.output.write_aggregates(key, stats, aggregate([series], start, end, bucket, stats))
+            return
+
+        # Aggregate keys with the same group-by tag value together
+        tags = dict([i.split("=")[0], i.split("=")[1]] for i in self.args.tags) if self.args.tags else {}
+        key_tags = dict((d.get('id'), d.get('tags') or {}) for d in self._query_definitions(tags))
+        groups = OrderedDict()
+        for key, series in pairs:
+            value = key_tags.get(key, {}).get(self.args.group_by, '')
+            groups.setdefault('{0}={1}'.format(self.args.group_by, value), []).append(series)
+        for group, series in groups.items():
+            self.output.write_aggregates(group, stats, aggregate(series, start, end, bucket, stats))
+
+    def _query_metric_aggregates_by_keys(self):
+        """ Get meric data of keys and aggregate it on the client
+        """
+        self._query_metric_aggregates(self.args.keys)
+
+    def _query_metric_aggregates_by_tags(self):
+        """ Get meric data of keys matching tags and aggregate it on the client
+        """
+        self._query_metric_aggregates(self._get_definition_keys())
+
+    def _follow(self, keys):
+        """ Poll for new meric data of keys, and print it as it arrives
+        """
+        from hawkular_client_cli.query import query_metrics
+
+        # Newest timestamp seen for each key
+        last = dict((key, int(total_milisecond(self.args.end)) - 1) for key in keys)
+        if not last:
+            return
+
+        # Values older than the previous poll by more than FOLLOW_LATENESS are not
+        # requested again, so keys that stopped reporting do not grow the poll window
+        cursor = [int(total_milisecond(self.args.end)) - FOLLOW_LATENESS]
+
+        def fetch_batch(batch):
+            # One request for a batch of keys starts at the oldest timestamp of the batch
+            start = max(min(last[key] for key in batch) + 1, cursor[0])
+            values = query_metrics(self.client, self.metric_type, batch, start=start, order='ASC')
+            if values is None:
+                return None
+            return [(key, values.get(key) or []) for key in batch]
+
+        def fetch(key):
+            values = self.client.query_metric(self.metric_type, key, start=last[key] + 1, order='ASC')
+            return key, values or []
+
+        try:
+            while True:
+                time.sleep(self.args.interval)
+
+                polled = int(time.time() * 1000)
+                for key, values in self._read(keys, fetch_batch, fetch):
+                    values = [v for v in values if v.get('timestamp') > last[key]]
+                    if values:
+                        values.sort(key=lambda v: v.get('timestamp'))
+                        last[key] = values[-1].get('timestamp')
+                        self.output.write_metric(key, values)
+                self.output.flush()
+                cursor[0] = polled - FOLLOW_LATENESS
+        except KeyboardInterrupt:
+            pass
+
+    def _query_metric_stats_by_keys(self):
+        """ get meric data
+        """
+        for key, values in self._read(self.args.keys, self._fetch_metric_stats_batch, self._fetch_metric_stats):
+            self.output.write_metric_stats(key, values)
 
     def _query_metric_by_keys(self):
         """ get meric data
         """
-        for key in self.args.keys:
-            print('key:', key)
-            values = self.client.query_metric(self.metric_type, key,
-                start=int(total_milisecond(self.args.start)),
-                end=int(total_milisecond(self.args.end)),
-                limit=self.args.limit)
-            print('values:')
-            for value in values:
-                timestamp = value.get('timestamp')
-                timestr = datetime.fromtimestamp(timestamp / 1000).strftime('%Y-%m-%d %H:%M:%S')
-                print ('    ', timestamp, '(', timestr, ')', value.get('value'))
-            print()
+        fetch_batch = None if self._is_paged() or self.data_cache else self._fetch_metric_batch
+        for key, values in self._read(self.args.keys, fetch_batch, self._fetch_metric):
+            self.output.write_metric(key, values)
+
+        if self.args.follow:
+            self._follow(self.args.keys)
 
     def _query_metric_by_tags(self):
         """ Get meric data
         """
-        tags = dict([i.split("=")[0], i.split("=")[1]] for i in self.args.tags) if self.args.tags else {}
-        definitions = self.client.query_metric_definitions(metric_type=self.metric_type, **tags)
-        for definition in definitions:
-            key = definition.get('id')
-            print('key:', key)
-            values = self.client.query_metric(self.metric_type, key,
-                start=int(total_milisecond(self.args.start)),
-                end=int(total_milisecond(self.args.end)),
-                limit=self.args.limit)
-            print('values:')
-            for value in values:
-                timestamp = value.get('timestamp')
-                timestr = datetime.fromtimestamp(timestamp / 1000).strftime('%Y-%m-%d %H:%M:%S')
-                print ('    ', timestamp, '(', timestr, ')', value.get('value'))
-            print()
+        keys = self._get_definition_keys()
+        fetch_batch = None if self._is_paged() or self.data_cache else self._fetch_metric_batch
+        for key, values in self._read(keys, fetch_batch, self._fetch_metric):
+            self.output.write_metric(key, values)
+
+        if self.args.follow:
+            self._follow(keys)
 
     def _query_metric_stats_by_tags(self):
         """ Get meric data
         """
-        tags = dict([i.split("=")[0], i.split("=")[1]] for i in self.args.tags) if self.args.tags else {}
-        definitions = self.client.query_metric_definitions(metric_type=self.metric_type, **tags)
-        for definition in definitions:
-            key = definition.get('id')
-            print('key:', key)
-            values = self.client.query_metric_stats(self.metric_type, key,
-                start=int(total_milisecond(self.args.start)),
-                end=int(total_milisecond(self.args.end)),
-                bucketDuration="{0}s".format(self.args.bucketDuration),
-                limit=self.args.limit)
-            print('values:')
-            for value in values:
-                timestamp = value.get('start')
-                timestr = datetime.fromtimestamp(timestamp / 1000).strftime('%Y-%m-%d %H:%M:%S')
-                print ('    ', timestamp, '(', timestr, ') avg:', value.get('avg'), '[',value.get('samples'), ']')
-            print()
+        keys = self._get_definition_keys()
+        for key, values in self._read(keys, self._fetch_metric_stats_batch, self._fetch_metric_stats):
+            self.output.write_metric_stats(key, values)
 
     def _push(self):
         """ Push meric data
         """
+        from hawkular.metrics import create_metric, create_datapoint
+        from hawkular_client_cli.push import PushError
+
+        metrics = []
+        timestamp = int(total_milisecond(self.args.data_time))
         for pair in self.args.values:
             key, value = pair.split("=")
-            timestamp = int(total_milisecond(self.args.data_time))
             self.log('Push:', key, value, timestamp)
-            self.client.push(self.metric_type, key, value, timestamp)
+            metrics.append(create_metric(self.metric_type, key, create_datapoint(value, timestamp)))
 
-    def _update_metric_tags(self):
-        """ Update metric tags
+        try:
+            self._push_metrics(metrics, self.args.batch_size)
+        except PushError as err:
+            for metric_type, key, key_err in err.failures:
+                print('[ERROR] Push failed:', key, key_err)
+            raise
+
+    def _push_metrics(self, metrics, batch_size):
+        """ Push metrics in batches, with retries and spooling
+        """
+        from hawkular_client_cli.push import push_metrics
+
+        spool = None
+        path = self.args.spool or self.config.get('hawkular').get('spool')
+        if path:
+            spool = Spool(path, self.args.spool_size * 1024 * 1024)
+
+        with self.tracer.span('push') as attributes:
+            total = push_metrics(self.client, metrics, batch_size, log=self.log,
+                                 stats=attributes,
+                                 flush_interval=self.args.flush_interval,
+                                 retries=self.args.retries,
+                                 spool=spool)
+
+        if spool is not None and spool.dropped:
+            raise ValueError('Spool file is full, dropped {0} metrics'.format(spool.dropped))
+        return total
+
+    def _export(self):
+        """ Export metric definitions and data into a directory
+        """
+        from hawkular_client_cli.migrate import export_metrics
+
+        tags = dict([i.split("=")[0], i.split("=")[1]] for i in self.args.tags) if self.args.tags else {}
+        with self.tracer.span('export') as attributes:
+            keys, datapoints = export_metrics(self.client, self.args.export_dir,
+                start=int(total_milisecond(self.args.start)),
+                end=int(total_milisecond(self.args.end)),
+                tags=tags,
+                chunk_size=self.args.chunk_size,
+                page_size=self.args.page_size,
+                workers=self.args.parallel,
+                log=self.log)
+            attributes.update({'keys': keys, 'datapoints': datapoints})
+        self.log('Exported:', keys, 'keys', datapoints, 'datapoints')
+
+    def _snapshot(self):
+        """ Save meric data of keys, or of keys matching tags, into a snapshot file
+        """
+        from hawkular_client_cli.query import iter_metric
+        from hawkular_client_cli.snapshot import write_snapshot
+
+        start = int(total_milisecond(self.args.start))
+        end = int(total_milisecond(self.args.end))
+        tags = dict([i.split("=")[0], i.split("=")[1]] for i in self.args.tags) if self.args.tags else {}
+        key_tags = dict((d.get('id'), d.get('tags') or {}) for d in self._query_definitions(tags))
+        keys = self.args.keys or list(key_tags)
+
+        def fetch(key):
+            return key, list(iter_metric(self.client, self.metric_type, key, start, end,
+                                         page_size=self.args.page_size))
+
+        metrics = ({'type': self.metric_type, 'id': key, 'tags': key_tags.get(key), 'data': values}
+                   for key, values in ordered_map(fetch, keys, self.args.parallel))
+        with self.tracer.span('snapshot') as attributes:
+            datapoints = write_snapshot(self.args.snapshot, metrics, tenant=self.tenant, url=self.url,
+                                        start=start, end=end)
+            attributes.update({'keys': len(keys), 'datapoints': datapoints})
+        self.log('Saved snapshot:', len(keys), 'keys', datapoints, 'datapoints')
+
+    def _import(self):
+        """ Import metric definitions and data from an export directory
+        """
+        from hawkular_client_cli.migrate import import_metrics
+
+        with self.tracer.span('import') as attributes:
+            definitions, datapoints = import_metrics(self.client, self.args.import_dir,
+                batch_size=self.args.batch_size,
+                page_size=self.args.page_size,
+                workers=self.args.parallel,
+                log=self.log,
+                retries=self.args.retries,
+                flush_interval=0)
+            attributes.update({'definitions': definitions, 'datapoints': datapoints})
+        self.log('Imported:', definitions, 'definitions', datapoints, 'datapoints')
+
+        # Cached definitions do not include the imported ones
+        if self.cache_ttl:
+            self._get_cache().invalidate(self._definitions_namespace())
+
+    def _push_file(self):
+        """ Push meric data lines from a file or stdin
+        """
+        from hawkular_client_cli.push import PushError, DEFAULT_BATCH_SIZE
+        from hawkular_client_cli.ingest import InvalidLines, read_lines, parse_lines
+
+        errors = InvalidLines()
+        keys = OrderedDict()
+        timestamp = int(total_milisecond(self.args.data_time))
+        batch_size = self.args.batch_size or DEFAULT_BATCH_SIZE
+
+        # Tags are updated every TAG_KEYS new keys, so long streams use constant memory
+        def seen(metrics):
+            for metric in metrics:
+                keys[(metric['type'], metric['id'])] = True
+                if len(keys) >= TAG_KEYS:
+                    self._update_tags(keys)
+                    keys.clear()
+                yield metric
+
+        lines = read_lines(self.args.push_file)
+        metrics = seen(parse_lines(lines, self.metric_type, timestamp, errors=errors, log=self.log))
+        try:
+            total = self._push_metrics(metrics, batch_size)
+            self.log('Pushed:', total, 'datapoints')
+        except PushError as err:
+            for metric_type, key, key_err in err.failures:
+                print('[ERROR] Push failed:', key, key_err)
+            raise
+
+        self._update_tags(keys)
+
+        if errors.count:
+            for number, err in errors.lines:
+                print('[ERROR] Line', number, err)
+            if errors.count > len(errors.lines):
+                print('[ERROR] and', errors.count - len(errors.lines), 'more invalid lines')
+            raise ValueError('Skipped {0} invalid lines'.format(errors.count))
+
+    def _get_rules(self):
+        """ Get the compiled auto-tagging rules of the config file
+        """
+        if self.rules is None:
+            self.rules = RuleSet([] if self.args.no_autotags else self.config.get('rules'))
+        return self.rules
+
+    def _get_current_tags(self, metric_type, keys):
+        """ Get a dict of key to tags for the definitions of keys of a metric type
+        """
+        from hawkular_client_cli.push import chunks
+
+        current = {}
+        for batch in chunks(sorted(keys), ID_FILTER_SIZE):
+            definitions = self._query_definitions({}, metric_type, '|'.join(batch))
+            current.update((d.get('id'), d.get('tags') or {}) for d in definitions)
+        return current
+
+    def _update_tags(self, keys):
+        """ Update tags of (metric type, key) pairs using the cli tags and config rules
         """
         # Get tags from command line args
         tags = dict([i.split("=")[0], i.split("=")[1]] for i in self.args.tags) if self.args.tags else {}
-        # Get tags rules from the config file
-        if self.args.no_autotags:
-            rules = []
-        else:
-            rules = self.config.get('rules') or []
+        rules = self._get_rules()
 
-        for pair in self.args.values:
-            key = pair.split("=")[0]
-            # Clean the tags for this key
-            key_tags = {}
-
-            # Check all tagging rules, and use the rules that apply for this key
-            for rule in rules:
-                compiled_rule = re.compile(rule.get('regex'))
-                if compiled_rule.match(key):
-                    key_tags.update(rule.get('tags') or {})
+        updates = []
+        for metric_type, key in OrderedDict.fromkeys(keys):
+            key_tags = rules.tags(key)
             key_tags.update(tags)
-
-            # Update tags in Hawkular
             if key_tags != {}:
-                self.log('Update:', key, key_tags)
-                self.client.update_metric_tags(self.metric_type, key, **key_tags)
+                updates.append((metric_type, key, key_tags))
+
+        # Skip keys that already have these tags, if definitions are cached,
+        # looking up only the definitions of the updated keys
+        if updates and self.cache_ttl:
+            current = {}
+            for metric_type in OrderedDict.fromkeys(t for t, _, _ in updates):
+                current[metric_type] = self._get_current_tags(
+                    metric_type, [key for t, key, _ in updates if t == metric_type])
+            changed = []
+            for metric_type, key, key_tags in updates:
+                key_current = current[metric_type].get(key)
+                if key_current is not None and \
+                        all(k in key_current and '{0}'.format(key_current[k]) == '{0}'.format(v)
+                            for k, v in key_tags.items()):
+                    self.log('Unchanged:', key, key_tags)
+                    continue
+                changed.append((metric_type, key, key_tags))
+            updates = changed
+
+        # Hawkular updates tags one key at a time, so updates are sent concurrently
+        def update(item):
+            metric_type, key, key_tags = item
+            self.log('Update:', key, key_tags)
+            self.client.update_metric_tags(metric_type, key, **key_tags)
+
+        with self.tracer.span('tags', updates=len(updates)):
+            for _ in ordered_map(update, updates, self.args.parallel):
+                pass
+
+        # Cached definitions hold tags, so they are out of date now
+        if updates and self.cache_ttl:
+            self._get_cache().invalidate(self._definitions_namespace())
+
+    def _update_metric_tags(self):
+        """ Update metric tags
+        """
+        self._update_tags((self.metric_type, pair.split("=")[0]) for pair in self.args.values)
 
     def _update_metric_tags_by_keys(self):
         """ Update metric tags
         """
-        # Get tags from command line args
-        tags = dict([i.split("=")[0], i.split("=")[1]] for i in self.args.tags) if self.args.tags else {}
-        # Get tags rules from the config file
-        if self.args.no_autotags:
-            rules = []
-        else:
-            rules = self.config.get('rules') or []
+        self._update_tags((self.metric_type, key) for key in self.args.keys)
 
-        for key in self.args.keys:
-            # Clean the tags for this key
-            key_tags = {}
+    def run(self):
+        """ Run the command line actions
+        """
+        from hawkular.metrics import MetricType
 
-            # Check all tagging rules, and use the rules that apply for this key
-            for rule in rules:
-                compiled_rule = re.compile(rule.get('regex'))
-                if compiled_rule.match(key):
-                    key_tags.update(rule.get('tags') or {})
-            key_tags.update(tags)
+        numeric = self.metric_type in [MetricType.Gauge, MetricType.Counter]
+        try:
+            self.output = get_writer(self.args.output, self.args.output_file,
+                                     timestr=self.args.timestr, numeric=numeric)
+        except Exception as err:
+            print(err, '\n')
+            sys.exit(1)
+        self.tracer.instrument_writer(self.output)
 
-            # Update tags in Hawkular
-            if key_tags != {}:
-                self.log('Update:', key, key_tags)
-                self.client.update_metric_tags(self.metric_type, key, **key_tags)
+        if self.args.data_cache and numeric:
+            self.data_cache = DatapointCache(cache_path('datapoints.sqlite'), self.args.cache_size)
 
-    def run(self):
+        try:
+            with self.tracer.span('run'):
+                self._run()
+        finally:
+            self.output.close()
+            self._write_trace()
+
+    def _write_trace(self):
+        """ Print the profile summary and write the trace file
+        """
+        if self.args.profile:
+            sys.stderr.write(self.tracer.summary() + '\n')
+        if self.args.trace_out:
+            try:
+                self.tracer.write(self.args.trace_out, self.args.trace_format)
+            except Exception as err:
+                print(err, '\n')
+                sys.exit(1)
+
+    def _run(self):
         """ Run the command line actions
         """
+        # Do clear the local cache
+        if self.args.cache_clear:
+            self.log('Clear local cache')
+            try:
+                self._get_cache().invalidate()
+                # Cached datapoints are cleared also when --data-cache is not set
+                if self.data_cache:
+                    self.data_cache.invalidate()
+                elif os.path.exists(cache_path('datapoints.sqlite')):
+                    data_cache = DatapointCache(cache_path('datapoints.sqlite'))
+                    try:
+                        data_cache.invalidate()
+                    finally:
+                        data_cache.close()
+            except Exception as err:
+                print(err, '\n')
+                sys.exit(1)
+
         # Do query status
         if self.args.status:
             self.log('Hawkualr alerts status:')
@@ -398,7 +1173,7 @@ class CommandLine(object):
         if self.args.list:
             self.log('List keys by tags:', self.args.tags)
             try:
-                self._query_metric_definitions()
+                self._for_tenants('_query_metric_definitions')
             except Exception as err:
                 print(err, '\n')
                 sys.exit(1)
@@ -416,10 +1191,12 @@ class CommandLine(object):
         if self.args.read and self.args.keys:
             self.log('Read metrics values by keys:', self.args.keys)
             try:
-                if self.args.bucketDuration == 0:
-                    self._query_metric_by_keys()
+                if self.args.aggregate:
+                    self._for_tenants('_query_metric_aggregates_by_keys')
+                elif self.args.bucketDuration == 0:
+                    self._for_tenants('_query_metric_by_keys')
                 else:
-                    self._query_metric_stats_by_keys()
+                    self._for_tenants('_query_metric_stats_by_keys')
             except Exception as err:
                 print(err, '\n')
                 sys.exit(1)
@@ -428,10 +1205,12 @@ class CommandLine(object):
         if self.args.read and self.args.tags:
             self.log('Read metrics values by tags:', self.args.tags)
             try:
-                if self.args.bucketDuration == 0:
-                    self._query_metric_by_tags()
+                if self.args.aggregate:
+                    self._for_tenants('_query_metric_aggregates_by_tags')
+                elif self.args.bucketDuration == 0:
+                    self._for_tenants('_query_metric_by_tags')
                 else:
-                    self._query_metric_stats_by_tags()
+                    self._for_tenants('_query_metric_stats_by_tags')
             except Exception as err:
                 print(err, '\n')
                 sys.exit(1)
@@ -452,6 +1231,42 @@ class CommandLine(object):
                 print(err, '\n')
                 sys.exit(1)
 
+        # Do actions push key value lines from file
+        if self.args.push_file:
+            self.log('Push metrics values from file:', self.args.push_file)
+            try:
+                self._push_file()
+            except Exception as err:
+                print(err, '\n')
+                sys.exit(1)
+
+        # Do actions export metrics
+        if self.args.export_dir:
+            self.log('Export metrics into:', self.args.export_dir)
+            try:
+                self._export()
+            except Exception as err:
+                print(err, '\n')
+                sys.exit(1)
+
+        # Do actions save a snapshot
+        if self.args.snapshot:
+            self.log('Save metrics snapshot into:', self.args.snapshot)
+            try:
+                self._snapshot()
+            except Exception as err:
+                print(err, '\n')
+                sys.exit(1)
+
+        # Do actions import metrics
+        if self.args.import_dir:
+            self.log('Import metrics from:', self.args.import_dir)
+            try:
+                self._import()
+            except Exception as err:
+                print(err, '\n')
+                sys.exit(1)
+
         # Do actions update tags
         if self.args.keys and self.args.tags:
             self.log('Update metrics tags by tag=value pairs:')
@@ -461,7 +1276,26 @@ class CommandLine(object):
                 print(err, '\n')
                 sys.exit(1)
 
+        # Do print cache statistics
+        if self.args.cache_stats:
+            try:
+                self._print_cache_stats()
+            except Exception as err:
+                print(err, '\n')
+                sys.exit(1)
+
 def main():
+    # Fast path for collectors pushing KEY=VALUE pairs while a daemon is running,
+    # forwarding the command does not need the arguments parser or a client
+    argv = sys.argv[1:]
+    if argv and all('=' in arg and not arg.startswith('-') for arg in argv):
+        result = forward(cache_path('daemon.sock', create=False), argv)
+        if result is not None:
+            status, output, error = result
+            sys.stdout.write(output)
+            sys.stderr.write(error)
+            sys.exit(status)
+
     coammand_line = CommandLine()
     coammand_line.run()
 
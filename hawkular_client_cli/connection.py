@@ -0,0 +1,112 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import io
+import json
+import base64
+import socket
+import threading
+from future.moves.urllib.parse import urlparse
+from future.moves.urllib.error import HTTPError, URLError
+from future.moves.http.client import HTTPConnection, HTTPSConnection, HTTPException
+from hawkular.metrics import HawkularMetricsClient
+
+class KeepAliveMetricsClient(HawkularMetricsClient):
+    """ Hawkular metrics client that keeps its http connections open
+
+    The regular client opens a new connection (and for https, does a new
+    TLS handshake) for every request. This client keeps a pool of idle
+    persistent connections, shared by the threads using it and by shallow
+    copies of it, and reconnects once if the server closed a connection.
+    Connections use the timeout argument (in seconds), or the socket default
+    timeout if it is not given.
+    """
+    def __init__(self, *args, **kwargs):
+        self._idle = []
+        self._lock = threading.Lock()
+        self.timeout = kwargs.pop('timeout', None)
+        # The base client derives the url path from the class name
+        kwargs.setdefault('path', 'hawkular/metrics')
+        HawkularMetricsClient.__init__(self, *args, **kwargs)
+
+    def _connect(self):
+        timeout = self.timeout if self.timeout is not None else socket.getdefaulttimeout()
+        if self.scheme == 'https':
+            return HTTPSConnection(self.host, self.port, timeout=timeout, context=self.context)
+        return HTTPConnection(self.host, self.port, timeout=timeout)
+
+    def _acquire(self):
+        """ Get an idle connection, or a new one
+        """
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def _release(self, conn):
+        with self._lock:
+            self._idle.append(conn)
+
+    def _headers(self):
+        headers = {'Content-Type': 'application/json',
+                   'Hawkular-Tenant': self.tenant_id,
+                   'Host': self.host,
+                   'Connection': 'keep-alive'}
+        if self.token is not None:
+            headers['Authorization'] = 'Bearer {0}'.format(self.token)
+        elif self.username is not None:
+            b64 = base64.b64encode((self.username + ':' + self.password).encode('utf-8'))
+            headers['Authorization'] = 'Basic {0}'.format(b64.decode())
+        if self.authtoken is not None:
+            headers['Hawkular-Admin-Token'] = self.authtoken
+        return headers
+
+    def _http(self, url, method, data=None, decoder=None, parse_json=True):
+        if data is not None and not isinstance(data, str):
+            data = json.dumps(data)
+        body = data.encode('utf-8') if data else None
+
+        url_args = urlparse(url)
+        path = url_args.path + ('?' + url_args.query if url_args.query else '')
+
+        # A kept alive connection may have been closed by the server, retry once on a new one
+        conn = self._acquire()
+        for reconnect in (False, True):
+            if reconnect:
+                conn = self._connect()
+            try:
+                conn.request(method, path, body, self._headers())
+                res = conn.getresponse()
+                payload = res.read()
+                break
+            except (HTTPException, socket.error) as err:
+                conn.close()
+                if reconnect:
+                    self._handle_error(URLError(err))
+        self._release(conn)
+
+        if res.status not in (200, 201, 204):
+            self._handle_error(HTTPError(url, res.status, res.reason, res.msg, io.BytesIO(payload)))
+
+        if not parse_json:
+            return payload.decode('utf-8')
+        if res.status == 200 and payload:
+            return json.loads(payload.decode('utf-8'), cls=decoder)
+        return {}
@@ -0,0 +1,186 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import io
+import os
+import sys
+import json
+import socket
+import signal
+import threading
+from hawkular_client_cli.output import TextStream
+
+# future.moves is slow to import, and forwarding a command should start fast
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+# Environment variables forwarded from the cli to the daemon
+ENVIRON = ['HAWKULAR_URL', 'HAWKULAR_TENANT', 'HAWKULAR_TOKEN',
+           'HAWKULAR_USERNAME', 'HAWKULAR_PASSWORD']
+
+# Seconds to wait for the daemon to accept or run a command
+TIMEOUT = 60
+
+def _send(sock, message):
+    sock.sendall((json.dumps(message) + '\n').encode('utf-8'))
+
+def _receive(sock):
+    data = b''
+    while not data.endswith(b'\n'):
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+    return json.loads(data.decode('utf-8'))
+
+def forward(path, argv, timeout=TIMEOUT):
+    """ Run a command in the daemon listening on path
+
+    Returns a (status, output, error) tuple, or None if no daemon is running.
+    """
+    if not os.path.exists(path):
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path)
+    except (socket.error, OSError):
+        # Stale socket file, a busy daemon, or a path we can not access,
+        # the command was not sent
+        sock.close()
+        return None
+
+    try:
+        _send(sock, {'argv': argv,
+                     'cwd': os.getcwd(),
+                     'environ': dict((k, os.environ[k]) for k in ENVIRON if k in os.environ)})
+        reply = _receive(sock)
+    except socket.timeout:
+        # The command may still run in the daemon, do not run it again
+        return 1, '', 'Daemon did not reply in {0} seconds, the command may still complete\n'.format(timeout)
+    finally:
+        sock.close()
+    return reply.get('status'), reply.get('output'), reply.get('error', '')
+
+class _Handler(socketserver.StreamRequestHandler):
+    # Do not let a stalled client block the daemon
+    timeout = TIMEOUT
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline().decode('utf-8'))
+        except (ValueError, socket.timeout):
+            return
+        status, output, error = self.server.execute(request)
+        self.wfile.write((json.dumps({'status': status, 'output': output, 'error': error}) +
+                          '\n').encode('utf-8'))
+
+class _ThreadStream(object):
+    """ Text stream writing into the stream of the current thread
+
+    Threads without a stream of their own write into the default stream.
+    """
+    def __init__(self, default):
+        self.default = default
+        self.local = threading.local()
+
+    def _stream(self):
+        return getattr(self.local, 'stream', None) or self.default
+
+    def write(self, text):
+        self._stream().write(text)
+
+    def flush(self):
+        self._stream().flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream(), name)
+
+def _thread_streams():
+    """ Replace sys.stdout and sys.stderr with thread streams, once
+    """
+    if not isinstance(sys.stdout, _ThreadStream):
+        sys.stdout = _ThreadStream(sys.stdout)
+    if not isinstance(sys.stderr, _ThreadStream):
+        sys.stderr = _ThreadStream(sys.stderr)
+
+class Daemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """ Run cli commands sent over a unix socket
+
+    Each command runs in its own thread, with its own output streams,
+    sharing parsed config files and connected clients (see CommandLine
+    shared argument) with other commands. Output is sent when a command
+    ends, so only commands with bounded output should be forwarded.
+    """
+    daemon_threads = True
+
+    def __init__(self, path, command_line, log=None):
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        if os.path.exists(path):
+            os.unlink(path)
+        socketserver.UnixStreamServer.__init__(self, path, _Handler)
+        os.chmod(path, 0o600)
+        self.path = path
+        self.command_line = command_line
+        self.log = log
+        self.shared = {}
+
+    def execute(self, request):
+        """ Run one command, returns a (status, output, error) tuple
+        """
+        argv = request.get('argv') or []
+        if sys.version_info[0] == 2:
+            # Arguments of a Python 2 process are byte strings
+            argv = [arg.encode('utf-8') for arg in argv]
+        if self.log:
+            self.log('Daemon run:', argv)
+
+        # print, argparse and the command output write into the thread streams
+        _thread_streams()
+        output, error = TextStream(io.BytesIO()), TextStream(io.BytesIO())
+        status = 0
+        try:
+            sys.stdout.local.stream, sys.stderr.local.stream = output, error
+            command_line = self.command_line(argv, environ=request.get('environ') or {},
+                                             shared=self.shared, cwd=request.get('cwd') or os.getcwd())
+            command_line.run()
+        except SystemExit as err:
+            status = err.code if isinstance(err.code, int) else 1
+        except Exception as err:
+            print(err, '\n')
+            status = 1
+        finally:
+            sys.stdout.local.stream = sys.stderr.local.stream = None
+        return status, output.stream.getvalue().decode('utf-8'), error.stream.getvalue().decode('utf-8')
+
+    def serve(self):
+        # Remove the socket file also when the daemon is terminated
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            self.serve_forever()
+        finally:
+            self.server_close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
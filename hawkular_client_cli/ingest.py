@@ -0,0 +1,141 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import io
+import sys
+import json
+import math
+from hawkular.metrics import MetricType, create_metric, create_datapoint
+
+METRIC_TYPES = {'gauge': MetricType.Gauge,
+                'counter': MetricType.Counter,
+                'string': MetricType.String,
+                'availability': MetricType.Availability}
+
+class InvalidLines(object):
+    """ Invalid ingest lines
+
+    The line number and error of the first max_lines invalid lines are
+    kept, and all of them are counted, so long streams use constant memory.
+    """
+    def __init__(self, max_lines=100):
+        self.max_lines = max_lines
+        self.lines = []
+        self.count = 0
+
+    def add(self, number, err):
+        self.count += 1
+        if len(self.lines) < self.max_lines:
+            self.lines.append((number, err))
+
+def _number(value, metric_type):
+    """ Convert the value of a gauge or counter datapoint to a number
+    """
+    if isinstance(value, bool):
+        raise ValueError('invalid value: {0}'.format(value))
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError('invalid value: {0}'.format(value))
+    if math.isnan(number) or math.isinf(number):
+        raise ValueError('invalid value: {0}'.format(value))
+    if metric_type == MetricType.Gauge:
+        return number
+    if not number.is_integer():
+        raise ValueError('invalid counter value: {0}'.format(value))
+    try:
+        # Keep all the digits of large counters
+        return int(value)
+    except (TypeError, ValueError):
+        return int(number)
+
+def read_lines(path):
+    """ Yield lines from a file, or from stdin if path is '-'
+    """
+    if path == '-':
+        for line in sys.stdin:
+            yield line
+    else:
+        with io.open(path, encoding='utf-8') as f:
+            for line in f:
+                yield line
+
+def parse_line(line, metric_type, timestamp):
+    """ Parse one ingest line into a metric
+
+    Lines are either 'key value [timestamp] [type]' or a JSON object with
+    'key' (or 'id'), 'value' and optional 'timestamp' and 'type' fields.
+    Returns None for empty lines and comments.
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+
+    if line.startswith('{'):
+        item = json.loads(line)
+        key = item.get('key') or item.get('id')
+        value = item.get('value')
+        timestamp = item.get('timestamp', timestamp)
+        type_name = item.get('type')
+        if key is None or value is None:
+            raise ValueError('missing key or value')
+        if isinstance(key, (list, dict)) or isinstance(value, (list, dict)):
+            raise ValueError('key and value must be strings or numbers')
+    else:
+        fields = line.split()
+        if len(fields) < 2 or len(fields) > 4:
+            raise ValueError('expected "key value [timestamp] [type]"')
+        key, value = fields[0], fields[1]
+        timestamp = fields[2] if len(fields) > 2 else timestamp
+        type_name = fields[3] if len(fields) > 3 else None
+
+    if type_name:
+        if type_name not in METRIC_TYPES:
+            raise ValueError('unknown metric type: {0}'.format(type_name))
+        metric_type = METRIC_TYPES[type_name]
+
+    try:
+        timestamp = int(timestamp)
+    except (TypeError, ValueError):
+        raise ValueError('invalid timestamp: {0}'.format(timestamp))
+
+    # A value the server can not parse fails the whole bulk request
+    if metric_type in (MetricType.Gauge, MetricType.Counter):
+        value = _number(value, metric_type)
+
+    return create_metric(metric_type, key, create_datapoint(value, timestamp))
+
+def parse_lines(lines, metric_type, timestamp, errors=None, log=None):
+    """ Yield metrics parsed from an iterable of ingest lines
+
+    Lines that can not be parsed are skipped, and added to errors (an
+    InvalidLines object).
+    """
+    for number, line in enumerate(lines, 1):
+        try:
+            metric = parse_line(line, metric_type, timestamp)
+        except ValueError as err:
+            if log:
+                log('Skip line:', number, err)
+            if errors is not None:
+                errors.add(number, err)
+            continue
+        if metric is not None:
+            yield metric
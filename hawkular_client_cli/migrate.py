@@ -0,0 +1,205 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import os
+import gzip
+import json
+from hawkular.metrics import create_metric
+from hawkular_client_cli.ingest import METRIC_TYPES
+from hawkular_client_cli.query import iter_metric
+from hawkular_client_cli.push import push_metrics, chunks
+from hawkular_client_cli.parallel import ordered_map
+
+DEFAULT_CHUNK_SIZE = 100
+
+DEFINITIONS = 'definitions.jsonl.gz'
+EXPORT_CHECKPOINT = 'export.json'
+IMPORT_CHECKPOINT = 'import.json'
+
+def _metric_type(name):
+    """ Get the MetricType of a definition type, e.g. 'gauge' or 'gauges'
+    """
+    return METRIC_TYPES.get(name, name)
+
+def _read_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def _write_json(path, data):
+    temp = path + '.part'
+    with open(temp, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.rename(temp, path)
+
+def write_lines(path, items):
+    """ Write items as gzip compressed JSON lines, returns the number of items
+
+    Items are written into a temporary file, renamed to path when done, so
+    path exists only if it is complete.
+    """
+    count = 0
+    temp = path + '.part'
+    with gzip.open(temp, 'wb', compresslevel=6) as f:
+        for item in items:
+            f.write((json.dumps(item) + '\n').encode('utf-8'))
+            count += 1
+    os.rename(temp, path)
+    return count
+
+def read_lines(path):
+    """ Yield items from a gzip compressed JSON lines file
+    """
+    with gzip.open(path, 'rb') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line.decode('utf-8'))
+
+def _chunk_name(index):
+    return 'data-{0:06d}.jsonl.gz'.format(index)
+
+def export_metrics(client, path, start, end, tags=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                   page_size=1000, workers=1, log=None):
+    """ Export metric definitions and datapoints into a directory
+
+    Definitions (of all metric types) matching tags are written into
+    definitions.jsonl.gz, and their datapoints between start and end into
+    data-NNNNNN.jsonl.gz files, each holding the datapoints of chunk_size
+    keys, one line per page of at most page_size datapoints. Chunks are read
+    concurrently by up to workers threads.
+
+    Completed chunks are recorded in export.json, running the export again
+    into the same directory resumes it, using the time range of the first
+    run. Returns the number of keys and datapoints exported by this run.
+    """
+    log = log or (lambda *args: None)
+    if not os.path.isdir(path):
+        os.makedirs(path)
+
+    source = {'url': client._get_base_url(), 'tenant': client.tenant_id}
+    checkpoint_path = os.path.join(path, EXPORT_CHECKPOINT)
+    checkpoint = _read_json(checkpoint_path)
+    if checkpoint is None:
+        checkpoint = {'source': source, 'start': start, 'end': end, 'tags': tags or {},
+                      'chunk_size': chunk_size, 'chunks': {}, 'done': False}
+        _write_json(checkpoint_path, checkpoint)
+    elif checkpoint.get('source') != source:
+        raise ValueError('{0} holds an export of another server or tenant'.format(path))
+    else:
+        log('Resume export, completed chunks:', len(checkpoint['chunks']))
+
+    # Keys are split into chunks by their order in the definitions file
+    definitions_path = os.path.join(path, DEFINITIONS)
+    if not os.path.exists(definitions_path):
+        definitions = client.query_metric_definitions(**checkpoint['tags']) or []
+        definitions = sorted(({'id': d.get('id'), 'type': d.get('type'), 'tags': d.get('tags') or {}}
+                              for d in definitions), key=lambda d: (d['type'], d['id']))
+        write_lines(definitions_path, definitions)
+    definitions = list(read_lines(definitions_path))
+
+    def export_chunk(item):
+        name, chunk = item
+        counts = {'keys': 0, 'datapoints': 0}
+
+        def lines():
+            for definition in chunk:
+                values = iter_metric(client, _metric_type(definition['type']), definition['id'],
+                                     checkpoint['start'], checkpoint['end'], page_size=page_size)
+                for page in chunks(values, page_size):
+                    counts['datapoints'] += len(page)
+                    yield {'id': definition['id'], 'type': definition['type'], 'data': page}
+                counts['keys'] += 1
+
+        write_lines(os.path.join(path, name), lines())
+        return name, counts
+
+    pending = [(_chunk_name(i), chunk)
+               for i, chunk in enumerate(chunks(definitions, checkpoint['chunk_size']))
+               if _chunk_name(i) not in checkpoint['chunks']]
+
+    keys = datapoints = 0
+    for name, counts in ordered_map(export_chunk, pending, workers):
+        log('Exported:', name, counts['keys'], 'keys', counts['datapoints'], 'datapoints')
+        checkpoint['chunks'][name] = counts
+        _write_json(checkpoint_path, checkpoint)
+        keys += counts['keys']
+        datapoints += counts['datapoints']
+
+    checkpoint['done'] = True
+    _write_json(checkpoint_path, checkpoint)
+    return keys, datapoints
+
+def import_metrics(client, path, batch_size, page_size=1000, workers=1, log=None, **options):
+    """ Import metric definitions and datapoints exported by export_metrics
+
+    Definitions are created (or their tags updated, if they exist), then
+    data chunks are pushed concurrently by up to workers threads, in
+    requests of at most batch_size metrics and page_size datapoints.
+    Options are passed to push_metrics.
+
+    Completed chunks are recorded in import.json, running the import again
+    into the same server and tenant resumes it. Returns the number of
+    definitions and datapoints imported by this run.
+    """
+    log = log or (lambda *args: None)
+    export = _read_json(os.path.join(path, EXPORT_CHECKPOINT))
+    if export is None or not export.get('done'):
+        raise ValueError('{0} does not hold a complete export'.format(path))
+
+    target = {'url': client._get_base_url(), 'tenant': client.tenant_id}
+    checkpoint_path = os.path.join(path, IMPORT_CHECKPOINT)
+    checkpoint = _read_json(checkpoint_path)
+    if checkpoint is None or checkpoint.get('target') != target:
+        checkpoint = {'target': target, 'definitions': False, 'chunks': {}}
+        _write_json(checkpoint_path, checkpoint)
+    else:
+        log('Resume import, completed chunks:', len(checkpoint['chunks']))
+
+    definitions = 0
+    if not checkpoint['definitions']:
+        def create(definition):
+            metric_type = _metric_type(definition['type'])
+            tags = definition.get('tags') or {}
+            if not client.create_metric_definition(metric_type, definition['id'], **tags) and tags:
+                # The definition exists, update its tags
+                client.update_metric_tags(metric_type, definition['id'], **tags)
+
+        for _ in ordered_map(create, read_lines(os.path.join(path, DEFINITIONS)), workers):
+            definitions += 1
+        checkpoint['definitions'] = True
+        _write_json(checkpoint_path, checkpoint)
+
+    def import_chunk(name):
+        metrics = (create_metric(_metric_type(line['type']), line['id'], line['data'])
+                   for line in read_lines(os.path.join(path, name)))
+        push_metrics(client, metrics, batch_size, log=log, max_points=page_size, **options)
+        return name, export['chunks'][name]['datapoints']
+
+    pending = [name for name in sorted(export['chunks']) if name not in checkpoint['chunks']]
+
+    datapoints = 0
+    for name, count in ordered_map(import_chunk, pending, workers):
+        log('Imported:', name, count, 'datapoints')
+        checkpoint['chunks'][name] = True
+        _write_json(checkpoint_path, checkpoint)
+        datapoints += count
+    return definitions, datapoints
@@ -0,0 +1,299 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import json
+import threading
+import time
+from future.moves.urllib.parse import urlparse, parse_qs, unquote
+from future.moves.http.server import BaseHTTPRequestHandler, HTTPServer
+from future.moves import socketserver
+
+_SHORT = {'gauges': 'gauge', 'counters': 'counter', 'strings': 'string',
+          'availability': 'availability', 'availabilities': 'availability'}
+_PLURAL = {'gauge': 'gauges', 'counter': 'counters', 'string': 'strings',
+           'availability': 'availability'}
+
+def _to_long(value):
+    try:
+        return int(value)
+    except ValueError:
+        return int(float(value))
+
+_NUMERIC = {'gauges': float, 'counters': _to_long}
+
+class MockStore(object):
+    """ In memory metric definitions and datapoints, by tenant
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.triggers = {}
+        self.tenants = ['_ops']
+
+    def add(self, tenant, metric_type, metric_id, data):
+        with self.lock:
+            metric = self.metrics.setdefault((tenant, metric_type, metric_id),
+                                             {'id': metric_id, 'type': metric_type,
+                                              'tenantId': tenant, 'tags': {}, 'data': {}})
+            # Like the server, convert gauge values to doubles and counter values to longs
+            convert = _NUMERIC.get(metric_type, lambda value: value)
+            for point in data:
+                metric['data'][int(point['timestamp'])] = convert(point['value'])
+            if tenant not in self.tenants:
+                self.tenants.append(tenant)
+
+    def add_trigger(self, tenant, trigger, conditions=None, alerts=None):
+        with self.lock:
+            self.triggers.setdefault(tenant, []).append(
+                {'trigger': trigger, 'conditions': conditions or [], 'alerts': alerts or []})
+
+    def query_triggers(self, tenant, ids=None, tags=None):
+        with self.lock:
+            out = []
+            for item in self.triggers.get(tenant, []):
+                trigger = item['trigger']
+                trigger_tags = trigger.get('tags') or {}
+                if (ids or tags) and trigger['id'] not in (ids or []) and \
+                        not any(trigger_tags.get(k) == v for k, v in (tags or {}).items()):
+                    continue
+                out.append(item)
+            return out
+
+    def definitions(self, tenant, metric_type=None, tags=None, ids=None):
+        with self.lock:
+            out = []
+            for (t, mt, mid), metric in sorted(self.metrics.items()):
+                if t != tenant or (metric_type and mt != metric_type):
+                    continue
+                if tags and any(metric['tags'].get(k) != v for k, v in tags.items()):
+                    continue
+                if ids is not None and mid not in ids:
+                    continue
+                out.append({'id': mid, 'type': _SHORT[mt], 'tenantId': t, 'tags': dict(metric['tags'])})
+            return out
+
+    def raw(self, tenant, metric_type, metric_id, start, end, limit, order):
+        with self.lock:
+            metric = self.metrics.get((tenant, metric_type, metric_id))
+            data = sorted((metric or {}).get('data', {}).items())
+        data = [(t, v) for t, v in data if (start is None or t >= start) and (end is None or t < end)]
+        if order == 'DESC' or (order is None and limit):
+            data.reverse()
+        if limit:
+            data = data[:limit]
+        return [{'timestamp': t, 'value': v} for t, v in data]
+
+def _buckets(points, start, end, duration):
+    """ Compute stats buckets of raw datapoints
+    """
+    duration = int(duration.rstrip('s')) * 1000
+    out = []
+    for bucket_start in range(start, end, duration):
+        values = [float(p['value']) for p in points
+                  if bucket_start <= p['timestamp'] < bucket_start + duration]
+        bucket = {'start': bucket_start, 'end': bucket_start + duration,
+                  'empty': not values, 'samples': len(values)}
+        if values:
+            bucket.update({'min': min(values), 'max': max(values), 'sum': sum(values),
+                           'avg': sum(values) / len(values)})
+        out.append(bucket)
+    return out
+
+def _page(items, query):
+    """ Get the page of items requested by the page and per_page query params
+    """
+    if 'per_page' not in query:
+        return items
+    size = int(query['per_page'])
+    start = int(query.get('page') or 0) * size
+    return items[start:start + size]
+
+class MockHandler(BaseHTTPRequestHandler):
+    """ Serve a subset of the Hawkular metrics REST API from a MockStore
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, code, body=None):
+        payload = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length).decode('utf-8')) if length else None
+
+    def _route(self, method):
+        server = self.server
+        started = time.time()
+        if server.latency:
+            time.sleep(server.latency)
+        url = urlparse(self.path)
+        query = dict((k, v[0]) for k, v in parse_qs(url.query).items())
+        parts = [unquote(p) for p in url.path.strip('/').split('/')]
+        tenant = self.headers.get('Hawkular-Tenant')
+        store = server.store
+        with store.lock:
+            failing = server.errors > 0
+            server.errors -= 1 if failing else 0
+        try:
+            if failing:
+                code, body = 503, {'errorMsg': 'unavailable'}
+            else:
+                code, body = self._dispatch(method, parts, query, tenant, store)
+        except Exception as err:
+            code, body = 500, {'errorMsg': str(err)}
+        # Record before replying, so the request is recorded when the client gets the reply
+        server.record(method, url.path, time.time() - started)
+        self._reply(code, body)
+
+    def _dispatch(self, method, parts, query, tenant, store):
+        if parts[:2] == ['hawkular', 'alerts']:
+            return self._dispatch_alerts(method, parts[2:], query, tenant, store)
+        parts = parts[2:]
+        if parts == ['status']:
+            return 200, {'Implementation-Version': '0.28.0', 'MetricsService': 'STARTED'}
+        if parts == ['tenants']:
+            return 200, [{'id': t} for t in store.tenants]
+        if parts == ['metrics'] and method == 'GET':
+            tags = dict(t.split(':', 1) for t in query['tags'].split(',')) if query.get('tags') else None
+            # Without tags, the id param is a list of ids separated by '|'
+            ids = set(query['id'].split('|')) if query.get('id') and not tags else None
+            defs = store.definitions(tenant, _PLURAL.get(query.get('type')), tags, ids)
+            return (200, defs) if defs else (204, None)
+        if parts == ['metrics', 'raw'] and method == 'POST':
+            body = self._body()
+            if any(metric['id'] in self.server.rejected for metrics in body.values() for metric in metrics):
+                return 400, {'errorMsg': 'rejected'}
+            for key, metrics in body.items():
+                for metric in metrics:
+                    store.add(tenant, _PLURAL[_SHORT[key]], metric['id'], metric['data'])
+            return 200, None
+        if parts == ['metrics', 'stats', 'query'] and method == 'POST':
+            body = self._body()
+            out = {}
+            for short, ids in body['metrics'].items():
+                out[short] = dict((i, _buckets(store.raw(tenant, _PLURAL[short], i, body['start'],
+                                                          body['end'], 0, 'ASC'),
+                                               body['start'], body['end'], body['bucketDuration']))
+                                  for i in ids)
+            return 200, out
+        metric_type = parts[0]
+        if len(parts) == 1 and method == 'POST':
+            body = self._body()
+            if (tenant, metric_type, body['id']) in store.metrics:
+                return 409, {'errorMsg': 'metric exists'}
+            store.add(tenant, metric_type, body['id'], [])
+            with store.lock:
+                store.metrics[(tenant, metric_type, body['id'])]['tags'].update(body.get('tags') or {})
+            return 201, None
+        if len(parts) == 3 and parts[2] == 'stats':
+            start, end = int(query['start']), int(query['end'])
+            data = store.raw(tenant, metric_type, parts[1], start, end, 0, 'ASC')
+            return 200, _buckets(data, start, end, query['bucketDuration'])
+        if len(parts) == 2 and parts[1] == 'raw' and method == 'POST':
+            body = self._body()
+            if any(metric['id'] in self.server.rejected for metric in body):
+                return 400, {'errorMsg': 'rejected'}
+            for metric in body:
+                store.add(tenant, metric_type, metric['id'], metric['data'])
+            return 200, None
+        if parts[1:] == ['raw', 'query'] and method == 'POST':
+            body = self._body()
+            out = []
+            for metric_id in body.get('ids', []):
+                data = store.raw(tenant, metric_type, metric_id, body.get('start'), body.get('end'),
+                                 body.get('limit'), body.get('order'))
+                if data:
+                    out.append({'id': metric_id, 'data': data})
+            return 200, out
+        if len(parts) == 3 and parts[2] == 'raw':
+            data = store.raw(tenant, metric_type, parts[1],
+                             int(query['start']) if 'start' in query else None,
+                             int(query['end']) if 'end' in query else None,
+                             int(query.get('limit') or 0), query.get('order'))
+            return (200, data) if data else (204, None)
+        if len(parts) == 3 and parts[2] == 'tags' and method == 'PUT':
+            body = self._body()
+            store.add(tenant, metric_type, parts[1], [])
+            with store.lock:
+                store.metrics[(tenant, metric_type, parts[1])]['tags'].update(body)
+            return 200, None
+        return 404, {'errorMsg': 'not found'}
+
+    def _dispatch_alerts(self, method, parts, query, tenant, store):
+        ids = query['triggerIds'].split(',') if query.get('triggerIds') else None
+        if parts == ['triggers'] and method == 'GET':
+            tags = dict(t.split('|', 1) for t in query['tags'].split(',')) if query.get('tags') else None
+            return 200, _page([item['trigger'] for item in store.query_triggers(tenant, ids, tags)], query)
+        if len(parts) == 3 and parts[0] == 'triggers' and parts[2] == 'conditions':
+            items = store.query_triggers(tenant, [parts[1]])
+            return (200, items[0]['conditions']) if items else (404, {'errorMsg': 'not found'})
+        if parts == [] and method == 'GET':
+            start, end = int(query.get('startTime') or 0), int(query.get('endTime') or 1 << 62)
+            alerts = [alert for item in store.query_triggers(tenant, ids) for alert in item['alerts']
+                      if start <= alert['ctime'] <= end]
+            alerts.sort(key=lambda alert: alert['ctime'], reverse=True)
+            return 200, _page(alerts, query)
+        return 200, []
+
+    def do_GET(self):
+        self._route('GET')
+
+    def do_POST(self):
+        self._route('POST')
+
+    def do_PUT(self):
+        self._route('PUT')
+
+class MockServer(socketserver.ThreadingMixIn, HTTPServer):
+    """ Local stand-in for a Hawkular server, for benchmarks and tests
+
+    Each request waits latency seconds before it is served, and is recorded
+    as a (method, path, duration) tuple. Alerts requests other than triggers,
+    trigger conditions and alerts return empty lists. Pushes including an id
+    in rejected fail with 400, and the next errors requests fail with 503.
+    """
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0):
+        HTTPServer.__init__(self, ('127.0.0.1', port), MockHandler)
+        self.latency = latency
+        self.store = MockStore()
+        self.requests = []
+        self.rejected = set()
+        self.errors = 0
+
+    def record(self, method, path, duration):
+        with self.store.lock:
+            self.requests.append((method, path, duration))
+
+    def start(self):
+        """ Serve requests in a background thread, returns the server url
+        """
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return 'http://127.0.0.1:{0}'.format(self.server_address[1])
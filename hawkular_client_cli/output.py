@@ -0,0 +1,372 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import io
+import sys
+import csv
+import json
+from datetime import datetime
+
+FORMATS = ['text', 'csv', 'jsonl', 'parquet']
+
+# Output buffer size for files
+_BUFFER_SIZE = 1 << 16
+
+# On Python 2, print and the csv module write byte strings
+_PY2 = sys.version_info[0] == 2
+_TEXT = type('')
+
+def timestr(timestamp):
+    """ Format a milliseconds timestamp as a local time string
+    """
+    return datetime.fromtimestamp(timestamp / 1000).strftime('%Y-%m-%d %H:%M:%S')
+
+class TextStream(object):
+    """ Write text into a binary stream
+
+    Text is encoded, byte strings are written as they are, so the stream
+    can be written by print and the csv module on Python 2 and 3.
+    """
+    def __init__(self, stream, encoding='utf-8'):
+        self.stream = stream
+        self.encoding = encoding
+
+    def write(self, text):
+        if not isinstance(text, bytes):
+            text = text.encode(self.encoding)
+        self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        self.stream.close()
+
+class StreamWriter(object):
+    """ Base class for writers of text streams
+
+    If tenant is set, records are tagged with the tenant they were read from.
+    """
+    def __init__(self, stream, timestr=False):
+        self.stream = stream
+        self.timestr = timestr
+        self.tenant = None
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        self.stream.flush()
+        if self.stream is not sys.stdout:
+            self.stream.close()
+
+class TextWriter(StreamWriter):
+    """ Write human readable text
+    """
+    def _tenant(self):
+        if self.tenant is not None:
+            print('tenant:', self.tenant, file=self.stream)
+
+    def write_metric(self, key, values):
+        self._tenant()
+        print('key:', key, file=self.stream)
+        print('values:', file=self.stream)
+        for value in values:
+            timestamp = value.get('timestamp')
+            print('    ', timestamp, '(', timestr(timestamp), ')', value.get('value'), file=self.stream)
+        print(file=self.stream)
+
+    def write_metric_stats(self, key, values):
+        self._tenant()
+        print('key:', key, file=self.stream)
+        print('values:', file=self.stream)
+        for value in values:
+            timestamp = value.get('start')
+            print('    ', timestamp, '(', timestr(timestamp), ') avg:', value.get('avg'),
+                  '[', value.get('samples'), ']', file=self.stream)
+        print(file=self.stream)
+
+    def write_aggregates(self, key, stats, rows):
+        self._tenant()
+        print('key:', key, file=self.stream)
+        print('values:', file=self.stream)
+        for row in rows:
+            timestamp = row.get('start')
+            fields = []
+            for name in stats:
+                fields += [name + ':', row.get(name)]
+            print('    ', timestamp, '(', timestr(timestamp), ')', *fields,
+                  file=self.stream, end=' ')
+            print('[', row.get('samples'), ']', file=self.stream)
+        print(file=self.stream)
+
+    def write_definitions(self, definitions):
+        for definition in definitions:
+            self._tenant()
+            print('key: ', definition.get('id'), file=self.stream)
+            print('tags:', definition.get('tags') or {}, file=self.stream)
+            print(file=self.stream)
+
+    def write_tenants(self, tenants):
+        for tenant in tenants:
+            print('id: ', tenant.get('id'), file=self.stream)
+
+class CsvWriter(StreamWriter):
+    """ Write comma separated values, with a header line for each kind of records
+    """
+    def __init__(self, stream, timestr=False):
+        StreamWriter.__init__(self, stream, timestr)
+        self.writer = csv.writer(stream)
+        self.header = None
+
+    def _header(self, header):
+        if self.timestr and 'timestamp' in header:
+            header = header + ['time']
+        if self.tenant is not None:
+            header = ['tenant'] + header
+        if header != self.header:
+            self.writer.writerow(header)
+            self.header = header
+
+    def _rows(self, rows, index=None):
+        if self.timestr and index is not None:
+            rows = (row + [timestr(row[index])] for row in rows)
+        if self.tenant is not None:
+            rows = ([self.tenant] + row for row in rows)
+        if _PY2:
+            # The Python 2 csv module writes only byte strings
+            rows = ([c.encode('utf-8') if isinstance(c, _TEXT) else c for c in row] for row in rows)
+        self.writer.writerows(rows)
+
+    def write_metric(self, key, values):
+        self._header(['key', 'timestamp', 'value'])
+        self._rows(([key, v.get('timestamp'), v.get('value')] for v in values), 1)
+
+    def write_metric_stats(self, key, values):
+        self._header(['key', 'timestamp', 'end', 'min', 'max', 'avg', 'samples'])
+        self._rows(([key, v.get('start'), v.get('end'), v.get('min'), v.get('max'),
+                     v.get('avg'), v.get('samples')] for v in values), 1)
+
+    def write_aggregates(self, key, stats, rows):
+        self._header(['key', 'timestamp', 'end', 'samples'] + list(stats))
+        self._rows(([key, r.get('start'), r.get('end'), r.get('samples')] +
+                    [r.get(name) for name in stats] for r in rows), 1)
+
+    def write_definitions(self, definitions):
+        self._header(['key', 'tags'])
+        self._rows([d.get('id'), json.dumps(d.get('tags') or {}, sort_keys=True)]
+                   for d in definitions)
+
+    def write_tenants(self, tenants):
+        self._header(['id'])
+        self._rows([t.get('id')] for t in tenants)
+
+class JsonLinesWriter(StreamWriter):
+    """ Write one JSON object per line
+    """
+    def __init__(self, stream, timestr=False):
+        StreamWriter.__init__(self, stream, timestr)
+        self.encode = json.JSONEncoder(separators=(',', ':')).encode
+
+    def _write(self, items):
+        write = self.stream.write
+        encode = self.encode
+        for item in items:
+            if self.timestr and 'timestamp' in item:
+                item['time'] = timestr(item['timestamp'])
+            if self.tenant is not None:
+                item['tenant'] = self.tenant
+            write(encode(item))
+            write('\n')
+
+    def write_metric(self, key, values):
+        self._write({'key': key, 'timestamp': v.get('timestamp'), 'value': v.get('value')}
+                    for v in values)
+
+    def write_metric_stats(self, key, values):
+        self._write(dict(v, key=key, timestamp=v.get('start')) for v in values)
+
+    def write_aggregates(self, key, stats, rows):
+        self._write(dict(r, key=key, timestamp=r.get('start')) for r in rows)
+
+    def write_definitions(self, definitions):
+        self._write({'key': d.get('id'), 'tags': d.get('tags') or {}} for d in definitions)
+
+    def write_tenants(self, tenants):
+        self._write({'id': t.get('id')} for t in tenants)
+
+class ParquetWriter(object):
+    """ Write columnar parquet files (requires the pyarrow module)
+
+    Rows are collected into row groups of ROW_GROUP_SIZE rows, a parquet
+    file holds one kind of records.
+    """
+    ROW_GROUP_SIZE = 65536
+
+    def __init__(self, path, timestr=False, numeric=True):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError('parquet output requires the pyarrow module')
+
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.path = path
+        self.timestr = timestr
+        self.numeric = numeric
+        self.writer = None
+        self.columns = None
+        self.tenant = None
+
+    def _open(self, schema):
+        if self.writer is None:
+            self.schema = self.pa.schema(schema)
+            self.writer = self.pq.ParquetWriter(self.path, self.schema)
+            self.columns = dict((name, []) for name, _ in schema)
+        elif [name for name, _ in schema] != self.schema.names:
+            raise ValueError('parquet output can hold only one kind of records')
+
+    def _append(self, row):
+        if self.tenant is not None:
+            row['tenant'] = self.tenant
+        for name, value in row.items():
+            self.columns[name].append(value)
+        if len(self.columns[self.schema.names[0]]) >= self.ROW_GROUP_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if self.writer is None or not self.columns[self.schema.names[0]]:
+            return
+        if self.timestr and 'time' in self.columns:
+            self.columns['time'] = [timestr(t) for t in self.columns['timestamp']]
+        table = self.pa.Table.from_pydict(self.columns, schema=self.schema)
+        self.writer.write_table(table)
+        self.columns = dict((name, []) for name in self.schema.names)
+
+    def _schema(self, fields):
+        if self.timestr and 'timestamp' in [name for name, _ in fields]:
+            fields = fields + [('time', self.pa.string())]
+        if self.tenant is not None:
+            fields = [('tenant', self.pa.string())] + fields
+        return fields
+
+    def write_metric(self, key, values):
+        value_type = self.pa.float64() if self.numeric else self.pa.string()
+        self._open(self._schema([('key', self.pa.string()),
+                                 ('timestamp', self.pa.int64()),
+                                 ('value', value_type)]))
+        for v in values:
+            value = v.get('value')
+            self._append({'key': key, 'timestamp': v.get('timestamp'),
+                          'value': float(value) if self.numeric else value})
+
+    def write_metric_stats(self, key, values):
+        f8 = self.pa.float64()
+        self._open(self._schema([('key', self.pa.string()), ('timestamp', self.pa.int64()),
+                                 ('end', self.pa.int64()), ('min', f8), ('max', f8),
+                                 ('avg', f8), ('samples', self.pa.int64())]))
+        for v in values:
+            self._append({'key': key, 'timestamp': v.get('start'), 'end': v.get('end'),
+                          'min': v.get('min'), 'max': v.get('max'), 'avg': v.get('avg'),
+                          'samples': v.get('samples')})
+
+    def write_aggregates(self, key, stats, rows):
+        f8 = self.pa.float64()
+        self._open(self._schema([('key', self.pa.string()), ('timestamp', self.pa.int64()),
+                                 ('end', self.pa.int64()), ('samples', self.pa.int64())] +
+                                [(name, f8) for name in stats]))
+        for r in rows:
+            row = {'key': key, 'timestamp': r.get('start'), 'end': r.get('end'),
+                   'samples': r.get('samples')}
+            row.update((name, r.get(name)) for name in stats)
+            self._append(row)
+
+    def write_definitions(self, definitions):
+        self._open(self._schema([('key', self.pa.string()), ('tags', self.pa.string())]))
+        for d in definitions:
+            self._append({'key': d.get('id'), 'tags': json.dumps(d.get('tags') or {}, sort_keys=True)})
+
+    def write_tenants(self, tenants):
+        self._open(self._schema([('id', self.pa.string())]))
+        for t in tenants:
+            self._append({'id': t.get('id')})
+
+    def flush(self):
+        self._flush()
+
+    def close(self):
+        self._flush()
+        if self.writer is not None:
+            self.writer.close()
+
+class RecordWriter(object):
+    """ Keep written records in memory, to write them into another writer later
+    """
+    def __init__(self):
+        self.records = []
+
+    def write_metric(self, key, values):
+        self.records.append(('write_metric', (key, list(values))))
+
+    def write_metric_stats(self, key, values):
+        self.records.append(('write_metric_stats', (key, list(values))))
+
+    def write_aggregates(self, key, stats, rows):
+        self.records.append(('write_aggregates', (key, stats, rows)))
+
+    def write_definitions(self, definitions):
+        self.records.append(('write_definitions', (list(definitions),)))
+
+    def write_tenants(self, tenants):
+        self.records.append(('write_tenants', (list(tenants),)))
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def replay(self, writer):
+        """ Write the kept records into writer
+        """
+        for name, args in self.records:
+            getattr(writer, name)(*args)
+
+def get_writer(output_format, path=None, timestr=False, numeric=True):
+    """ Create an output writer
+
+    Output goes to path, or to stdout if path is None or '-'.
+    """
+    if output_format == 'parquet':
+        if not path or path == '-':
+            raise ValueError('parquet output requires an output file')
+        return ParquetWriter(path, timestr=timestr, numeric=numeric)
+
+    if not path or path == '-':
+        stream = sys.stdout
+    else:
+        stream = TextStream(io.open(path, 'wb', buffering=_BUFFER_SIZE))
+
+    if output_format == 'csv':
+        return CsvWriter(stream, timestr=timestr)
+    if output_format == 'jsonl':
+        return JsonLinesWriter(stream, timestr=timestr)
+    return TextWriter(stream)
@@ -0,0 +1,41 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+def ordered_map(func, items, workers=1):
+    """ Yield func(item) for each item, in the order of items
+
+    Calls are spread over a pool of at most workers threads, so no more
+    than workers requests are in flight at any time. With one worker
+    (or less) items are processed serially in the calling thread.
+    """
+    if workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    # multiprocessing is slow to import, and not needed for serial calls
+    from multiprocessing.pool import ThreadPool
+
+    pool = ThreadPool(workers)
+    try:
+        for result in pool.imap(func, items):
+            yield result
+    finally:
+        pool.terminate()
@@ -0,0 +1,292 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import time
+import random
+import socket
+import threading
+from collections import OrderedDict
+from future.moves.urllib.error import HTTPError, URLError
+from hawkular.metrics import MetricType
+
+DEFAULT_BATCH_SIZE = 500
+
+# Keys used by the mixed type /metrics/raw endpoint
+_BULK_KEYS = {MetricType.Gauge: 'gauges',
+              MetricType.Counter: 'counters',
+              MetricType.String: 'strings',
+              MetricType.Availability: 'availabilities'}
+
+class PushError(Exception):
+    """ Some of the pushed metrics were not accepted by the server
+    """
+    def __init__(self, failures, total):
+        self.failures = failures
+        self.total = total
+        Exception.__init__(self, 'Push failed for {0} of {1} metrics'.format(len(failures), total))
+
+def chunks(iterable, size):
+    """ Split an iterable into lists of at most size items
+
+    A size of zero (or less) puts all the items in one list.
+    """
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if size > 0 and len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def merge_metrics(metrics):
+    """ Merge the datapoints of metrics with the same type and id
+    """
+    merged = OrderedDict()
+    for metric in metrics:
+        index = (metric['type'], metric['id'])
+        if index in merged:
+            merged[index]['data'].extend(metric['data'])
+        else:
+            merged[index] = {'type': metric['type'],
+                             'id': metric['id'],
+                             'data': list(metric['data'])}
+    return list(merged.values())
+
+def is_retryable(err):
+    """ Check if a push error is temporary (server or connection errors)
+    """
+    if isinstance(err, HTTPError):
+        return err.code >= 500 or err.code == 429
+    return isinstance(err, (URLError, socket.error))
+
+def push_batch(client, metrics):
+    """ Push a list of metrics using one bulk request
+
+    If the server rejects the bulk request, metrics are pushed one by one,
+    so we can tell which of them were rejected. Temporary errors (see
+    is_retryable) are raised.
+
+    Returns a list of (metric type, metric id, error) tuples.
+    """
+    metrics = merge_metrics(metrics)
+    payload = {}
+    for metric in metrics:
+        payload.setdefault(_BULK_KEYS[metric['type']], []).append(
+            {'id': metric['id'], 'data': metric['data']})
+
+    try:
+        client._post(client._get_metrics_raw_url(client._get_url()), payload, parse_json=False)
+        return []
+    except Exception as err:
+        if is_retryable(err):
+            raise
+
+    failures = []
+    for metric in metrics:
+        try:
+            # client.put pops the type key, so send a copy
+            client.put(dict(metric))
+        except Exception as err:
+            failures.append((metric['type'], metric['id'], err))
+    return failures
+
+class PushQueue(object):
+    """ Buffer metrics and push them in batches
+
+    Metrics are pushed when batch_size metrics (or max_points datapoints,
+    if set) are buffered, and, once start is called, by a background thread
+    at most flush_interval seconds after they were added. Failed
+    pushes are retried with exponential backoff and jitter. If a spool is
+    given, batches that still fail are appended to it, and for the next
+    cooldown seconds batches are spooled without trying the server.
+    """
+    BACKOFF = 0.5
+    MAX_BACKOFF = 30.0
+
+    def __init__(self, client, batch_size=DEFAULT_BATCH_SIZE, flush_interval=5.0,
+                 retries=3, spool=None, cooldown=60.0, log=None, max_points=0):
+        self.client = client
+        self.batch_size = batch_size
+        self.max_points = max_points
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.spool = spool
+        self.cooldown = cooldown
+        self.log = log or (lambda *args: None)
+        self.buffer = []
+        self.points = 0
+        self.flushed = time.time()
+        self.down_until = 0
+        self.failures = []
+        self.total = 0
+        self.retried = 0
+        self.spooled = 0
+        self.lock = threading.RLock()
+        self.timer = None
+        self.stopped = threading.Event()
+        self.error = None
+
+    def is_down(self):
+        """ Check if the server failed recently
+        """
+        return time.time() < self.down_until
+
+    def start(self):
+        """ Start a thread pushing buffered metrics every flush_interval seconds
+        """
+        if self.flush_interval and self.timer is None:
+            self.stopped.clear()
+            self.timer = threading.Thread(target=self._flush_periodically)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def stop(self):
+        """ Stop the flush thread
+        """
+        if self.timer is not None:
+            self.stopped.set()
+            self.timer.join()
+            self.timer = None
+
+    def _flush_periodically(self):
+        # Wake up when the oldest buffered metrics are due
+        while not self.stopped.wait(max(self.flushed + self.flush_interval - time.time(), 0.1)):
+            with self.lock:
+                if self.error is not None or not self.buffer or \
+                        time.time() - self.flushed < self.flush_interval:
+                    continue
+                try:
+                    self.flush()
+                except Exception as err:
+                    # Raised by the next add or flush of the pushing thread
+                    self.error = err
+
+    def _raise_error(self):
+        if self.error is not None:
+            err, self.error = self.error, None
+            raise err
+
+    def add(self, metric):
+        with self.lock:
+            self._raise_error()
+            self.buffer.append(metric)
+            self.points += len(metric.get('data') or [])
+            self.total += 1
+            if (self.batch_size > 0 and len(self.buffer) >= self.batch_size) or \
+                    (self.max_points > 0 and self.points >= self.max_points) or \
+                    (self.flush_interval and time.time() - self.flushed >= self.flush_interval):
+                self.flush()
+
+    def flush(self):
+        """ Push the buffered metrics
+        """
+        with self.lock:
+            self._raise_error()
+            self._flush()
+
+    def _flush(self):
+        batch, self.buffer = self.buffer, []
+        self.points = 0
+        self.flushed = time.time()
+        if not batch:
+            return
+
+        if self.spool is not None and self.is_down():
+            self._spool(batch)
+            return
+
+        self.log('Push batch:', len(batch), 'metrics')
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                delay = min(self.MAX_BACKOFF, self.BACKOFF * 2 ** (attempt - 1))
+                self.retried += 1
+                self.log('Push retry', attempt, 'after error:', error)
+                time.sleep(random.uniform(0, delay))
+            try:
+                self.failures.extend(push_batch(self.client, batch))
+                self.down_until = 0
+                return
+            except Exception as err:
+                if not is_retryable(err):
+                    raise
+                error = err
+
+        if self.spool is None:
+            raise error
+        self.down_until = time.time() + self.cooldown
+        self._spool(batch)
+
+    def _spool(self, batch):
+        self.log('Spool batch:', len(batch), 'metrics')
+        self.spool.append(batch)
+        self.spooled += len(batch)
+
+    def replay(self):
+        """ Push the metrics spooled by earlier runs
+
+        If the server fails again, the rest of the spooled metrics are moved
+        to the new spool file.
+        """
+        for metric in self.spool.replay():
+            self.add(metric)
+        self.flush()
+
+    def close(self):
+        """ Push the buffered metrics, raises PushError if the server rejected metrics
+        """
+        self.flush()
+        if self.failures:
+            raise PushError(self.failures, self.total)
+
+def push_metrics(client, metrics, batch_size=0, log=None, stats=None, **options):
+    """ Push metrics in bulk requests of at most batch_size metrics
+
+    Metrics can be any iterable (including a generator) of dicts created
+    with hawkular.metrics.create_metric. Options are passed to PushQueue,
+    if a spool is given and the server is up, spooled metrics are replayed
+    after the new ones. If stats is a dict, it is updated with the pushed,
+    retried and spooled counts. Raises PushError if any of the metrics failed.
+    """
+    queue = PushQueue(client, batch_size, log=log, **options)
+    queue.start()
+    try:
+        try:
+            for metric in metrics:
+                queue.add(metric)
+        except Exception:
+            # Push (or spool) the metrics read before the input failed
+            queue.flush()
+            raise
+        queue.flush()
+
+        if queue.spool is not None and not queue.is_down():
+            queue.replay()
+
+        queue.close()
+    finally:
+        queue.stop()
+        if stats is not None:
+            stats.update({'metrics': queue.total, 'retries': queue.retried,
+                          'spooled': queue.spooled})
+    if queue.spooled and log:
+        log('Spooled:', queue.spooled, 'metrics')
+    return queue.total
@@ -0,0 +1,85 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+from hawkular.metrics import MetricType
+from hawkular.client import HawkularMetricsError
+
+# Keys used by the /metrics/stats/query endpoint
+_STATS_KEYS = {MetricType.Gauge: 'gauge',
+               MetricType.Counter: 'counter',
+               MetricType.String: 'string',
+               MetricType.Availability: 'availability'}
+
+# Http codes returned by servers that do not implement the query endpoints
+_UNSUPPORTED_CODES = (404, 405)
+
+def query_metrics(client, metric_type, keys, **options):
+    """ Query raw data of many metrics in one request
+
+    Options are sent as the request body (e.g. start, end, limit, order).
+    Returns a dict of key to datapoints list, or None if the server does
+    not support multi metric queries.
+    """
+    url = client._get_url(metric_type) + '/raw/query'
+    body = dict(options, ids=list(keys))
+    try:
+        result = client._post(url, body)
+    except HawkularMetricsError as err:
+        if err.code in _UNSUPPORTED_CODES:
+            return None
+        raise
+    return dict((item.get('id'), item.get('data') or []) for item in result or [])
+
+def query_metrics_stats(client, metric_type, keys, **options):
+    """ Query statistics of many metrics in one request
+
+    Options are sent as the request body (e.g. start, end, bucketDuration).
+    Returns a dict of key to buckets list, or None if the server does not
+    support multi metric queries.
+    """
+    url = client._get_url() + '/stats/query'
+    body = dict(options, metrics={_STATS_KEYS[metric_type]: list(keys)})
+    try:
+        result = client._post(url, body)
+    except HawkularMetricsError as err:
+        if err.code in _UNSUPPORTED_CODES:
+            return None
+        raise
+    return (result or {}).get(_STATS_KEYS[metric_type]) or {}
+
+def iter_metric(client, metric_type, key, start, end, limit=0, page_size=1000):
+    """ Yield datapoints of one metric, newest first, one page at a time
+
+    Pages are requested using the timestamp of the last datapoint as the
+    end of the next page, so memory use is bounded by the page size. A
+    limit of zero yields all the datapoints between start and end.
+    """
+    count = 0
+    while not limit or count < limit:
+        size = min(page_size, limit - count) if limit else page_size
+        page = client.query_metric(metric_type, key, start=start, end=end,
+                                   limit=size, order='DESC') or []
+        for value in page:
+            yield value
+        count += len(page)
+        if len(page) < size:
+            return
+        # The end of a range is exclusive, so the last datapoint is not repeated
+        end = page[-1].get('timestamp')
@@ -0,0 +1,83 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import re
+
+# Characters with a special meaning in regular expressions
+_SPECIAL = set('.^$*+?{}[]\\|()')
+
+def literal_prefix(regex):
+    """ Get the literal text that any string matching regex (using re.match) starts with
+    """
+    # Alternatives may start with different prefixes
+    if '|' in regex:
+        return ''
+
+    # Rules are matched from the start of keys, so a leading ^ changes nothing
+    if regex.startswith('^'):
+        regex = regex[1:]
+
+    prefix = []
+    for char in regex:
+        if char in _SPECIAL:
+            # These quantifiers make the previous character optional
+            if char in '*?{' and prefix:
+                prefix.pop()
+            break
+        prefix.append(char)
+    return ''.join(prefix)
+
+class RuleSet(object):
+    """ Auto-tagging rules from the config file
+
+    Rules are compiled once, and indexed by the first character of their
+    literal prefix, so a key is matched only against rules that can match
+    it. Tags of all the matching rules are merged in rules order. The tags
+    of up to memo_size keys are remembered.
+    """
+    def __init__(self, rules, memo_size=10000):
+        self.memo_size = memo_size
+        self.rules = []
+        self.index = {}
+        self.unindexed = []
+        self.memo = {}
+        for i, rule in enumerate(rules or []):
+            regex = rule.get('regex')
+            prefix = literal_prefix(regex)
+            self.rules.append((re.compile(regex), prefix, rule.get('tags') or {}))
+            if prefix:
+                self.index.setdefault(prefix[0], []).append(i)
+            else:
+                self.unindexed.append(i)
+
+    def tags(self, key):
+        """ Get a new dict of the tags of all the rules matching key
+        """
+        if key not in self.memo:
+            if len(self.memo) >= self.memo_size:
+                self.memo.clear()
+            candidates = sorted(self.index.get(key[:1], []) + self.unindexed)
+            tags = {}
+            for i in candidates:
+                compiled_rule, prefix, rule_tags = self.rules[i]
+                if key.startswith(prefix) and compiled_rule.match(key):
+                    tags.update(rule_tags)
+            self.memo[key] = tags
+        return dict(self.memo[key])
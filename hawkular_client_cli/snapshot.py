@@ -0,0 +1,260 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import os
+import re
+import sys
+import json
+import mmap
+import numbers
+import struct
+from bisect import bisect_left
+from hawkular.metrics import MetricType
+
+# A snapshot file is:
+#   MAGIC
+#   for each metric, 8 byte aligned blocks of:
+#     int64 timestamps, ascending
+#     int64 values if they are all integers, float64 values, or for non numeric
+#     metrics, int64 offsets (one more than the values) into the utf-8 encoded
+#     values that follow them
+#   the index, a utf-8 JSON object
+#   uint64 index size (little endian)
+#   MAGIC
+MAGIC = b'HKSNAP01'
+
+_NUMERIC = (MetricType.Gauge, MetricType.Counter)
+
+_TYPECODES = {'int64': 'q', 'float64': 'd'}
+
+def _pack(typecode, values):
+    """ Pack a list of int64 (typecode 'q') or float64 ('d') numbers, in native byte order
+    """
+    return struct.pack(str('={0}{1}').format(len(values), typecode), *values)
+
+class _Packed(object):
+    """ Read only sequence of numbers packed in a buffer
+
+    Used on Python 2, where memoryview has no cast method.
+    """
+    def __init__(self, buffer, offset, count, typecode):
+        self.buffer = buffer
+        self.offset = offset
+        self.count = count
+        self.format = str('=' + typecode)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError('index out of range')
+        return struct.unpack_from(self.format, self.buffer, self.offset + index * 8)[0]
+
+def _pad(f, offset):
+    padding = -offset % 8
+    f.write(b'\0' * padding)
+    return offset + padding
+
+def write_snapshot(path, metrics, **info):
+    """ Write metrics into a snapshot file, returns the number of datapoints written
+
+    Metrics are an iterable of dicts with type (a MetricType), id, tags and
+    data (a list of datapoint dicts), written one at a time. Info items
+    (e.g. tenant, start and end) are kept in the snapshot index. Metrics are
+    written into a temporary file, renamed to path when done, so a failed
+    write does not replace an existing snapshot.
+    """
+    temp = path + '.part'
+    try:
+        total = _write_snapshot(temp, metrics, info)
+    except Exception:
+        if os.path.exists(temp):
+            os.unlink(temp)
+        raise
+    os.rename(temp, path)
+    return total
+
+def _write_snapshot(path, metrics, info):
+    index = dict(info, version=1, byteorder=sys.byteorder, metrics=[])
+    total = 0
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        offset = len(MAGIC)
+        for metric in metrics:
+            data = sorted(metric['data'], key=lambda v: v.get('timestamp'))
+            values = [v.get('value') for v in data]
+            if metric['type'] not in _NUMERIC:
+                kind = 'packed'
+            elif all(isinstance(v, numbers.Integral) and not isinstance(v, bool) for v in values):
+                kind = 'int64'
+            else:
+                kind = 'float64'
+            entry = {'id': metric['id'], 'type': MetricType.short(metric['type']),
+                     'tags': metric.get('tags') or {}, 'count': len(data),
+                     'values': kind, 'offset': offset}
+
+            f.write(_pack('q', [v.get('timestamp') for v in data]))
+            offset += len(data) * 8
+            if kind != 'packed':
+                f.write(_pack(_TYPECODES[kind], values))
+                offset += len(data) * 8
+            else:
+                encoded = [('{0}'.format(value)).encode('utf-8') for value in values]
+                offsets = [0]
+                for value in encoded:
+                    offsets.append(offsets[-1] + len(value))
+                f.write(_pack('q', offsets))
+                f.write(b''.join(encoded))
+                offset = _pad(f, offset + len(offsets) * 8 + offsets[-1])
+
+            index['metrics'].append(entry)
+            total += len(data)
+
+        encoded = json.dumps(index).encode('utf-8')
+        f.write(encoded)
+        f.write(struct.pack('<Q', len(encoded)))
+        f.write(MAGIC)
+    return total
+
+def _match(value, pattern):
+    """ Match a tag value using Hawkular tag query syntax, '*' matches any value
+    """
+    if value is None:
+        return False
+    return pattern == '*' or re.match('(?:{0})$'.format(pattern), '{0}'.format(value)) is not None
+
+def _buckets(timestamps, values, start, end, duration):
+    buckets = []
+    for bucket_start in range(start, end, duration):
+        bucket_end = min(bucket_start + duration, end)
+        i, j = bisect_left(timestamps, bucket_start), bisect_left(timestamps, bucket_end)
+        bucket = {'start': bucket_start, 'end': bucket_end, 'samples': j - i, 'empty': i == j}
+        if i < j:
+            data = sorted(values[i:j])
+            bucket.update({'min': data[0], 'max': data[-1], 'sum': sum(data),
+                           'avg': sum(data) / len(data), 'median': data[len(data) // 2]})
+        buckets.append(bucket)
+    return buckets
+
+class SnapshotClient(object):
+    """ Read only stand-in for a hawkular metrics client, querying a snapshot file
+
+    The snapshot is memory mapped, only the index is parsed, and queries
+    read the timestamps and values of the requested time ranges. Multi
+    metric queries are not supported (like a legacy api server).
+    """
+    legacy_api = True
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC or self.map[-len(MAGIC):] != MAGIC:
+            raise ValueError('{0} is not a snapshot file'.format(path))
+
+        size_offset = len(self.map) - len(MAGIC) - 8
+        size = struct.unpack('<Q', self.map[size_offset:size_offset + 8])[0]
+        self.index = json.loads(self.map[size_offset - size:size_offset].decode('utf-8'))
+        if self.index.get('byteorder') != sys.byteorder:
+            raise ValueError('{0} was written on a {1} endian machine'.format(
+                path, self.index.get('byteorder')))
+
+        self.path = path
+        self.tenant_id = self.index.get('tenant')
+        # Python 2 mmap objects do not support memoryview
+        self.view = memoryview(self.map) if hasattr(memoryview, 'cast') else None
+        self.metrics = dict(((m['type'], m['id']), m) for m in self.index['metrics'])
+
+    def _numbers(self, offset, count, typecode):
+        """ Get a sequence of count numbers packed in the file at offset
+        """
+        if self.view is not None:
+            return self.view[offset:offset + count * 8].cast(str(typecode))
+        return _Packed(self.map, offset, count, typecode)
+
+    def _arrays(self, metric_type, metric_id):
+        """ Get (timestamps, values) sequences of a metric, mapped from the file
+        """
+        metric = self.metrics.get((MetricType.short(metric_type), metric_id))
+        if metric is None:
+            return [], []
+        count = metric['count']
+        offset = metric['offset']
+        timestamps = self._numbers(offset, count, 'q')
+        offset += count * 8
+        if metric['values'] in _TYPECODES:
+            return timestamps, self._numbers(offset, count, _TYPECODES[metric['values']])
+
+        offsets = self._numbers(offset, count + 1, 'q')
+        base = offset + (count + 1) * 8
+        values = [self.map[base + offsets[i]:base + offsets[i + 1]].decode('utf-8')
+                  for i in range(count)]
+        return timestamps, values
+
+    def _range(self, timestamps, start, end):
+        i = 0 if start is None else bisect_left(timestamps, start)
+        j = len(timestamps) if end is None else bisect_left(timestamps, end)
+        return i, j
+
+    def query_metric(self, metric_type, metric_id, start=None, end=None, limit=None,
+                     order=None, **query_options):
+        timestamps, values = self._arrays(metric_type, metric_id)
+        i, j = self._range(timestamps, start, end)
+        indexes = range(i, j) if order == 'ASC' else range(j - 1, i - 1, -1)
+        if limit:
+            indexes = indexes[:limit]
+        return [{'timestamp': timestamps[k], 'value': values[k]} for k in indexes]
+
+    def query_metric_stats(self, metric_type, metric_id, start=None, end=None,
+                           bucketDuration=None, **query_options):
+        if metric_type not in _NUMERIC:
+            raise ValueError('statistics require numeric metrics')
+        timestamps, values = self._arrays(metric_type, metric_id)
+        start = self.index.get('start') if start is None else start
+        end = self.index.get('end') if end is None else end
+        duration = int('{0}'.format(bucketDuration).rstrip('s')) * 1000 if bucketDuration else end - start
+        buckets = _buckets(timestamps, values, start, end, max(duration, 1))
+        limit = query_options.get('limit')
+        return buckets[:limit] if limit else buckets
+
+    def query_metric_definitions(self, metric_type=None, id_filter=None, **tags):
+        definitions = []
+        for metric in self.index['metrics']:
+            if metric_type is not None and metric['type'] != MetricType.short(metric_type):
+                continue
+            if id_filter is not None and not re.match('(?:{0})$'.format(id_filter), metric['id']):
+                continue
+            if not all(_match(metric['tags'].get(k), v) for k, v in tags.items()):
+                continue
+            definitions.append({'id': metric['id'], 'type': metric['type'],
+                                'tenantId': self.tenant_id, 'tags': dict(metric['tags'])})
+        return definitions
+
+    def query_tenants(self):
+        return [{'id': self.tenant_id}]
+
+    def _read_only(self, *args, **kwargs):
+        raise ValueError('offline snapshots are read only')
+
+    put = update_metric_tags = create_metric_definition = _read_only
@@ -0,0 +1,84 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import io
+import os
+import glob
+import json
+
+class Spool(object):
+    """ Append only on-disk queue of metrics, one JSON object per line
+
+    Metrics that could not be pushed are appended to the spool file, and
+    replayed by a later push. The spool file grows up to max_bytes, newer
+    metrics are dropped (and counted) after that.
+    """
+    def __init__(self, path, max_bytes=100 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.dropped = 0
+
+    def append(self, metrics):
+        """ Append a list of metrics to the spool file
+        """
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        with io.open(self.path, 'ab') as f:
+            for metric in metrics:
+                # max_bytes caps the encoded size, not the number of characters
+                line = (json.dumps(metric, ensure_ascii=False) + '\n').encode('utf-8')
+                if size + len(line) > self.max_bytes:
+                    self.dropped += 1
+                    continue
+                f.write(line)
+                size += len(line)
+
+    def _claim(self):
+        """ Move the spool file aside so new metrics go to a new file
+
+        Returns the claimed files, including files claimed by runs that
+        were interrupted while replaying.
+        """
+        if os.path.exists(self.path):
+            os.rename(self.path, '{0}.replay-{1}'.format(self.path, os.getpid()))
+        return sorted(glob.glob(self.path + '.replay-*'))
+
+    def replay(self):
+        """ Yield spooled metrics
+
+        A claimed file is removed once all its metrics were yielded.
+        """
+        for path in self._claim():
+            try:
+                f = io.open(path, encoding='utf-8')
+            except (IOError, OSError):
+                # Claimed and removed by another replaying process
+                continue
+            with f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        yield json.loads(line)
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def size(self):
+        """ Get the size of the spool file in bytes
+        """
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
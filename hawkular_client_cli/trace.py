@@ -0,0 +1,245 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import io
+import os
+import json
+import time
+import binascii
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+
+TRACE_FORMATS = ['chrome', 'otel']
+
+# Url path parts that are not metric ids, trigger ids or tenant names
+_ROUTE_PARTS = set(['hawkular', 'metrics', 'alerts', 'gauges', 'counters', 'strings',
+                    'availability', 'raw', 'data', 'query', 'stats', 'tags', 'status',
+                    'tenants', 'triggers', 'conditions', 'events'])
+
+def _route(url):
+    """ Get the path of a url, with ids replaced by '*'
+    """
+    from future.moves.urllib.parse import urlparse, unquote
+
+    parts = [unquote(p) for p in urlparse(url).path.strip('/').split('/')]
+    return '/' + '/'.join(p if p in _ROUTE_PARTS else '*' for p in parts)
+
+def _span_id(size=8):
+    return binascii.hexlify(os.urandom(size)).decode('ascii')
+
+class Tracer(object):
+    """ Collect timing spans of cli phases, http requests and output writes
+
+    A disabled tracer records nothing, so spans can be used unconditionally.
+    Each span is a dict with a name, a kind (phase, http or output), start
+    and end times in seconds, the thread it ran in, its parent phase and
+    attributes (e.g. payload bytes or retry counts).
+    """
+    def __init__(self, enabled=True, start=None):
+        self.enabled = enabled
+        self.spans = []
+        self.lock = threading.Lock()
+        self.trace_id = _span_id(16)
+        self.root = {'id': _span_id(), 'name': 'hawkular-cli', 'kind': 'phase',
+                     'start': start or time.time(), 'end': None, 'parent': None,
+                     'thread': threading.current_thread().ident, 'attributes': {}}
+        # Open phase spans of the thread that created the tracer, other
+        # threads keep their own stack and default to its innermost phase
+        self.main = [self.root]
+        self.local = threading.local()
+        self.local.phases = self.main
+
+    def _phases(self):
+        """ Get the open phase spans of the current thread
+        """
+        phases = getattr(self.local, 'phases', None)
+        if phases is None:
+            phases = self.local.phases = []
+        return phases
+
+    def _parent(self):
+        """ Get the id of the innermost open phase, in this thread or the main one
+        """
+        phases = self._phases() or self.main
+        return phases[-1]['id']
+
+    def add(self, name, kind, start, end, attributes=None, parent=None, span_id=None):
+        """ Record a span that already ended
+        """
+        if not self.enabled:
+            return
+        span = {'id': span_id or _span_id(), 'name': name, 'kind': kind, 'start': start, 'end': end,
+                'parent': parent or self._parent(),
+                'thread': threading.current_thread().ident,
+                'attributes': attributes or {}}
+        with self.lock:
+            self.spans.append(span)
+
+    @contextmanager
+    def span(self, name, kind='phase', **attributes):
+        """ Time a block of code, yields the span attributes dict
+        """
+        if not self.enabled:
+            yield attributes
+            return
+
+        phases = self._phases()
+        span = {'id': _span_id(), 'parent': self._parent()}
+        if kind == 'phase':
+            phases.append(span)
+        start = time.time()
+        try:
+            yield attributes
+        except Exception as err:
+            attributes['error'] = '{0}'.format(err)
+            raise
+        finally:
+            if kind == 'phase':
+                phases.remove(span)
+            self.add(name, kind, start, time.time(), attributes, span['parent'], span['id'])
+
+    def instrument(self, client):
+        """ Record a span for each http request of a hawkular client
+        """
+        if not self.enabled or not hasattr(client, '_http'):
+            return
+        http = client._http
+
+        def traced(url, method, data=None, decoder=None, parse_json=True):
+            if data is not None and not isinstance(data, str):
+                data = json.dumps(data)
+            with self.span('{0} {1}'.format(method, _route(url)), 'http',
+                           url=url, request_bytes=len(data.encode('utf-8')) if data else 0) as attributes:
+                try:
+                    text = http(url, method, data, decoder, parse_json=False)
+                except Exception as err:
+                    attributes['status'] = getattr(err, 'code', None)
+                    raise
+                attributes['response_bytes'] = len(text.encode('utf-8')) if text else 0
+            if not parse_json:
+                return text
+            return json.loads(text, cls=decoder) if text else {}
+
+        client._http = traced
+
+    def instrument_writer(self, writer):
+        """ Record a span for each write of an output writer
+        """
+        if not self.enabled:
+            return
+
+        def wrap(name, method):
+            def traced(*args, **kwargs):
+                with self.span(name, 'output'):
+                    return method(*args, **kwargs)
+            return traced
+
+        for name in ('write_metric', 'write_metric_stats', 'write_aggregates',
+                     'write_definitions', 'write_tenants', 'flush', 'close'):
+            if hasattr(writer, name):
+                setattr(writer, name, wrap('output ' + name, getattr(writer, name)))
+
+    def finish(self):
+        """ End the root span, returns all the spans, the root span first
+        """
+        if self.root['end'] is None:
+            self.root['end'] = time.time()
+        with self.lock:
+            return [self.root] + sorted(self.spans, key=lambda s: s['start'])
+
+    def summary(self):
+        """ Get a table of span counts and durations, grouped by span name
+        """
+        groups = OrderedDict()
+        for span in self.finish():
+            group = groups.setdefault((span['kind'], span['name']),
+                                      {'count': 0, 'total': 0.0, 'max': 0.0,
+                                       'bytes': 0, 'retries': 0})
+            duration = (span['end'] - span['start']) * 1000.0
+            attributes = span['attributes']
+            group['count'] += 1
+            group['total'] += duration
+            group['max'] = max(group['max'], duration)
+            group['bytes'] += attributes.get('request_bytes', 0) + attributes.get('response_bytes', 0)
+            group['retries'] += attributes.get('retries', 0)
+
+        lines = ['{0:<48} {1:>7} {2:>11} {3:>9} {4:>9} {5:>11} {6:>7}'.format(
+            'Span', 'Count', 'Total ms', 'Avg ms', 'Max ms', 'Bytes', 'Retries')]
+        for (kind, name), group in groups.items():
+            lines.append('{0:<48} {1:>7} {2:>11.2f} {3:>9.2f} {4:>9.2f} {5:>11} {6:>7}'.format(
+                name[:48], group['count'], group['total'], group['total'] / group['count'],
+                group['max'], group['bytes'], group['retries']))
+        return '\n'.join(lines)
+
+    def chrome(self):
+        """ Get the spans as a Chrome trace events dict
+        """
+        spans = self.finish()
+        pid = os.getpid()
+        events = []
+        for span in spans:
+            events.append({'name': span['name'], 'cat': span['kind'], 'ph': 'X',
+                           'ts': int((span['start'] - self.root['start']) * 1000000),
+                           'dur': int((span['end'] - span['start']) * 1000000),
+                           'pid': pid, 'tid': span['thread'],
+                           'args': span['attributes']})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def otel(self):
+        """ Get the spans as an OpenTelemetry (OTLP JSON) traces dict
+        """
+        def value(v):
+            if isinstance(v, bool):
+                return {'boolValue': v}
+            if isinstance(v, int):
+                return {'intValue': '{0}'.format(v)}
+            if isinstance(v, float):
+                return {'doubleValue': v}
+            return {'stringValue': '{0}'.format(v)}
+
+        spans = []
+        for span in self.finish():
+            otel_span = {'traceId': self.trace_id, 'spanId': span['id'], 'name': span['name'],
+                         # 3 is SPAN_KIND_CLIENT, 1 is SPAN_KIND_INTERNAL
+                         'kind': 3 if span['kind'] == 'http' else 1,
+                         'startTimeUnixNano': '{0}'.format(int(span['start'] * 1e9)),
+                         'endTimeUnixNano': '{0}'.format(int(span['end'] * 1e9)),
+                         'attributes': [{'key': k, 'value': value(v)}
+                                        for k, v in sorted(span['attributes'].items())
+                                        if v is not None],
+                         # 2 is STATUS_CODE_ERROR
+                         'status': {'code': 2} if 'error' in span['attributes'] else {}}
+            if span['parent']:
+                otel_span['parentSpanId'] = span['parent']
+            spans.append(otel_span)
+
+        return {'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name',
+                                         'value': {'stringValue': 'hawkular-cli'}}]},
+            'scopeSpans': [{'scope': {'name': 'hawkular_client_cli'}, 'spans': spans}]}]}
+
+    def write(self, path, trace_format='chrome'):
+        """ Write the spans into a file as Chrome trace or OpenTelemetry JSON
+        """
+        trace = self.chrome() if trace_format == 'chrome' else self.otel()
+        # json.dumps returns a byte string on Python 2
+        with io.open(path, 'wb') as f:
+            f.write(json.dumps(trace).encode('utf-8'))
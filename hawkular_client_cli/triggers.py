@@ -0,0 +1,59 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+def iter_trigger_pages(client, ids=None, tags=None, page_size=100):
+    """ Yield pages of alert triggers (as dicts), filtered by the server
+
+    ids is a list of trigger ids, and tags a dict of tag values, triggers
+    matching any of them are returned. Pages are requested one at a time,
+    until a page holds less than page_size triggers, or the same triggers
+    as the previous page (a server ignoring the page param).
+    """
+    params = {}
+    if ids:
+        params['triggerIds'] = ','.join(ids)
+    if tags:
+        params['tags'] = ','.join('{0}|{1}'.format(k, v) for k, v in sorted(tags.items()))
+
+    page = 0
+    previous = None
+    while True:
+        url = client._service_url('triggers', dict(params, page=page, per_page=page_size))
+        triggers = client._get(url) or []
+        ids = [trigger.get('id') for trigger in triggers]
+        if ids == previous:
+            return
+        yield triggers
+        if len(triggers) < page_size:
+            return
+        previous = ids
+        page += 1
+
+def query_trigger_conditions(client, trigger_id):
+    """ Get the conditions (as dicts) of an alert trigger
+    """
+    return client._get(client._service_url(['triggers', trigger_id, 'conditions'])) or []
+
+def query_trigger_alerts(client, trigger_id, start, end, limit=10):
+    """ Get the newest alerts (as dicts) fired by an alert trigger between start and end
+    """
+    params = {'triggerIds': trigger_id, 'startTime': start, 'endTime': end, 'thin': 'true',
+              'sort': 'ctime', 'order': 'desc', 'page': 0, 'per_page': limit}
+    return client._get(client._service_url('', params)) or []
@@ -27,7 +27,8 @@ setup(name='hawkular-client-cli',
         'hawkular-client>=0.5.2',
     ],
     entry_points={
-        'console_scripts': ['hawkular-cli=hawkular_client_cli.command_line:main'],
+        'console_scripts': ['hawkular-cli=hawkular_client_cli.command_line:main',
+                            'hawkular-cli-benchmark=hawkular_client_cli.benchmark:main'],
     },
     include_package_data=True,
     zip_safe=False)
@@ -0,0 +1,155 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from hawkular_client_cli.command_line import CommandLine, total_milisecond
+from hawkular_client_cli.mock_server import MockServer
+
+try:
+    import numpy
+    from hawkular_client_cli.aggregate import aggregate, check_stats, to_arrays
+except ImportError:
+    numpy = None
+
+def _series(timestamps, values):
+    return to_arrays([{'timestamp': t, 'value': v} for t, v in zip(timestamps, values)])
+
+def _column(rows, name):
+    return [row[name] for row in rows]
+
+@unittest.skipIf(numpy is None, 'client side aggregation requires numpy')
+class AggregateTest(unittest.TestCase):
+    # Buckets [0, 10000), [10000, 20000) (empty) and [20000, 25000)
+    GAUGE = ([21000, 1000, 3000, 2000, 22000, -1000, 25000], [10, 1, 3, 5, 20, 100, 100])
+    # Increases 5, reset to 3, 5, 12, 5
+    COUNTER = ([1000, 5000, 12000, 15000, 21000, 24000], [10, 15, 3, 8, 20, 25])
+
+    def _aggregate(self, series, stats, bucket=10000):
+        return aggregate([_series(*s) for s in series], 0, 25000, bucket, stats)
+
+    def test_buckets(self):
+        rows = self._aggregate([self.GAUGE], ['count'])
+
+        self.assertEqual([(r['start'], r['end'], r['samples']) for r in rows],
+                         [(0, 10000, 3), (10000, 20000, 0), (20000, 25000, 2)])
+        self.assertEqual(_column(rows, 'count'), [3, 0, 2])
+
+    def test_value_stats(self):
+        rows = self._aggregate([self.GAUGE], ['min', 'max', 'sum', 'avg', 'median'])
+
+        self.assertEqual(_column(rows, 'min'), [1, None, 10])
+        self.assertEqual(_column(rows, 'max'), [5, None, 20])
+        self.assertEqual(_column(rows, 'sum'), [9, None, 30])
+        self.assertEqual(_column(rows, 'avg'), [3, None, 15])
+        self.assertEqual(_column(rows, 'median'), [3, None, 15])
+
+    def test_percentile(self):
+        rows = self._aggregate([self.GAUGE], ['p90', 'p50.5'])
+
+        # Linear interpolation between the closest ranks
+        self.assertAlmostEqual(rows[0]['p90'], 4.6)
+        self.assertIsNone(rows[1]['p90'])
+        self.assertAlmostEqual(rows[2]['p90'], 19)
+        self.assertAlmostEqual(rows[2]['p50.5'], 15.05)
+
+    def test_delta(self):
+        rows = self._aggregate([self.COUNTER], ['delta'])
+
+        self.assertEqual(_column(rows, 'delta'), [5, 8, 17])
+
+    def test_rate(self):
+        rows = self._aggregate([self.COUNTER], ['rate'])
+
+        # The last bucket is 5 seconds long
+        self.assertEqual(_column(rows, 'rate'), [0.5, 0.8, 3.4])
+
+    def test_one_bucket(self):
+        rows = self._aggregate([self.COUNTER], ['delta', 'rate', 'max'], bucket=0)
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]['start'], rows[0]['end'], rows[0]['samples']), (0, 25000, 6))
+        self.assertEqual(rows[0]['delta'], 30)
+        self.assertEqual(rows[0]['rate'], 1.2)
+        self.assertEqual(rows[0]['max'], 25)
+
+    def test_group(self):
+        other = ([4000, 11000], [7, 2])
+        rows = self._aggregate([self.COUNTER, other], ['count', 'max', 'delta'])
+
+        # Value stats use the datapoints of all the series, deltas are summed
+        self.assertEqual(_column(rows, 'count'), [3, 3, 2])
+        self.assertEqual(_column(rows, 'max'), [15, 8, 25])
+        self.assertEqual(_column(rows, 'delta'), [5, 10, 17])
+
+    def test_empty(self):
+        rows = self._aggregate([([], [])], ['min', 'count', 'delta', 'p99'])
+
+        self.assertEqual(_column(rows, 'min'), [None] * 3)
+        self.assertEqual(_column(rows, 'count'), [0] * 3)
+        self.assertEqual(_column(rows, 'delta'), [0] * 3)
+        self.assertEqual(self._aggregate([], ['sum'])[0]['sum'], None)
+
+    def test_check_stats(self):
+        check_stats(['min', 'p99', 'p99.9', 'rate'])
+        for name in ['p', 'p100', 'mean', 'p50x']:
+            with self.assertRaises(ValueError):
+                check_stats([name])
+
+@unittest.skipIf(numpy is None, 'client side aggregation requires numpy')
+class GroupByTest(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer()
+        self.url = self.server.start()
+        self.dir = tempfile.mkdtemp()
+        self.start = int(total_milisecond(datetime(2017, 1, 1)))
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.dir)
+
+    def _add(self, key, host, values):
+        store = self.server.store
+        store.add('test', 'gauges', key, [{'timestamp': self.start + t, 'value': v} for t, v in values])
+        store.metrics[('test', 'gauges', key)]['tags'].update({'app': 'web', 'host': host})
+
+    def test_group_by(self):
+        self._add('a', 'h1', [(1000, 1), (11000, 4)])
+        self._add('b', 'h1', [(2000, 2)])
+        self._add('c', 'h2', [(3000, 5), (12000, 6)])
+        path = os.path.join(self.dir, 'out.jsonl')
+        CommandLine(['-c', os.devnull, '--no-daemon', '--url', self.url, '--tenant', 'test',
+                     '--username', 'test', '--password', 'test', '-a', 'app=web', '--read',
+                     '-A', 'sum', 'count', '-G', 'host', '-s', '2017-01-01 00:00:00',
+                     '-e', '2017-01-01 00:00:20', '-b', '10', '-o', 'jsonl', '-O', path]).run()
+
+        with open(path) as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual([(r['key'], r['timestamp'] - self.start, r['count'], r['sum']) for r in rows],
+                         [('host=h1', 0, 2, 3), ('host=h1', 10000, 1, 4),
+                          ('host=h2', 0, 1, 5), ('host=h2', 10000, 1, 6)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from hawkular_client_cli.cache import DatapointCache
+
+class _Source(object):
+    """ Fake server holding one datapoint every step milliseconds
+    """
+    def __init__(self, step=10):
+        self.step = step
+        self.calls = []
+
+    def __call__(self, start, end):
+        self.calls.append((start, end))
+        first = -(-start // self.step) * self.step
+        # Return the newest datapoints first, like the server
+        return [{'timestamp': t, 'value': t // self.step} for t in reversed(range(first, end, self.step))]
+
+class DatapointCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache = DatapointCache(os.path.join(self.dir, 'datapoints.sqlite'), settle=0)
+        self.source = _Source()
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.dir)
+
+    def _read(self, start, end):
+        return self.cache.read('ns', 'key', start, end, self.source)
+
+    def _segment(self):
+        start, end, timestamps, _ = self.cache._load('ns', 'key')
+        return start, end, len(timestamps)
+
+    def test_miss(self):
+        points = self._read(0, 100)
+
+        self.assertEqual(points, [(t, t // 10) for t in range(0, 100, 10)])
+        self.assertEqual(self.source.calls, [(0, 100)])
+        self.assertEqual(self._segment(), (0, 100, 10))
+
+    def test_hit(self):
+        self._read(0, 100)
+        points = self._read(20, 60)
+
+        self.assertEqual(points, [(t, t // 10) for t in range(20, 60, 10)])
+        self.assertEqual(self.source.calls, [(0, 100)])
+        # Reads served from the cache do not rewrite the segment
+        self.assertEqual(self._segment(), (0, 100, 10))
+
+    def test_tail_gap(self):
+        self._read(0, 100)
+        points = self._read(50, 150)
+
+        self.assertEqual(points, [(t, t // 10) for t in range(50, 150, 10)])
+        self.assertEqual(self.source.calls, [(0, 100), (100, 150)])
+        self.assertEqual(self._segment(), (50, 150, 10))
+
+    def test_head_gap(self):
+        self._read(100, 200)
+        points = self._read(50, 150)
+
+        self.assertEqual(points, [(t, t // 10) for t in range(50, 150, 10)])
+        self.assertEqual(self.source.calls, [(100, 200), (50, 100)])
+        self.assertEqual(self._segment(), (50, 150, 10))
+
+    def test_sliding_window(self):
+        for hour in range(10):
+            self._read(hour * 100, hour * 100 + 800)
+
+        # The segment never grows beyond the requested window
+        self.assertEqual(self._segment(), (900, 1700, 80))
+        self.assertEqual(self.source.calls[1:], [(h * 100 + 700, h * 100 + 800) for h in range(1, 10)])
+
+    def test_disjoint(self):
+        self._read(0, 100)
+        self._read(500, 600)
+
+        self.assertEqual(self.source.calls, [(0, 100), (500, 600)])
+        self.assertEqual(self._segment(), (500, 600, 10))
+
+    def test_integer_values(self):
+        self._read(0, 100)
+        points = self._read(0, 100)
+
+        self.assertTrue(all(type(v) is int for _, v in points))
+
+    def test_settle(self):
+        self.cache.settle = 60000
+        now = int(time.time() * 1000)
+        start, end = now - 120000, now + 1000
+        self.source.step = 1000
+        points = self._read(start, end)
+        cached_start, cached_end, count = self._segment()
+
+        self.assertEqual(cached_start, start)
+        self.assertTrue(now - 60000 <= cached_end <= int(time.time() * 1000) - 60000)
+        self.assertEqual(count, len([t for t, _ in points if t < cached_end]))
+        # The unsettled end of the range is fetched again
+        self._read(start, end)
+        self.assertEqual(self.source.calls[-1], (cached_end, end))
+
+if __name__ == '__main__':
+    unittest.main()
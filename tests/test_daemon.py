@@ -0,0 +1,114 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from hawkular_client_cli.command_line import CommandLine
+from hawkular_client_cli.daemon import Daemon, forward
+from hawkular_client_cli.mock_server import MockServer
+
+_TENANT = 'test'
+
+class _SlowCommandLine(CommandLine):
+    """ Command line sleeping before running commands with a 'slow' key
+    """
+    def run(self):
+        if 'slow' in (self.args.keys or []):
+            time.sleep(1)
+        CommandLine.run(self)
+
+class DaemonTest(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer()
+        url = self.server.start()
+        self.dir = tempfile.mkdtemp()
+        self.daemon = Daemon(os.path.join(self.dir, 'run', 'daemon.sock'), _SlowCommandLine)
+        thread = threading.Thread(target=self.daemon.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.argv = ['-c', os.devnull, '--url', url, '--tenant', _TENANT,
+                     '--username', _TENANT, '--password', _TENANT]
+
+    def tearDown(self):
+        self.daemon.shutdown()
+        self.daemon.server_close()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.dir)
+
+    def _forward(self, *argv):
+        return forward(self.daemon.path, list(argv) + self.argv)
+
+    def test_push_and_read(self):
+        self.assertEqual(self._forward('key=1.5', '-S', '2017-01-01 00:00:00'), (0, '', ''))
+
+        status, output, error = self._forward('--read', '--keys', 'key', '--limit', '10',
+                                              '-s', '2016-12-31', '-e', '2017-01-02')
+        self.assertEqual(status, 0)
+        self.assertIn('key: key', output)
+        self.assertIn(') 1.5', output)
+
+    def test_argument_error(self):
+        status, output, error = self._forward('--no-such-argument')
+
+        self.assertEqual(status, 2)
+        self.assertIn('unrecognized arguments: --no-such-argument', error)
+
+    def test_relative_path(self):
+        os.mkdir(os.path.join(self.dir, 'cwd'))
+        with open(os.path.join(self.dir, 'cwd', 'lines'), 'w') as f:
+            f.write('a 1 1000\n')
+
+        cwd = os.getcwd()
+        os.chdir(os.path.join(self.dir, 'cwd'))
+        try:
+            status, _, _ = self._forward('--push-file', 'lines')
+        finally:
+            os.chdir(cwd)
+
+        self.assertEqual(status, 0)
+        self.assertIn((_TENANT, 'gauges', 'a'), self.server.store.metrics)
+
+    def test_concurrent(self):
+        results = {}
+
+        def slow():
+            results['slow'] = self._forward('--read', '--keys', 'slow', '--limit', '10')
+        thread = threading.Thread(target=slow)
+        thread.start()
+        time.sleep(0.2)
+        started = time.time()
+        # A push does not wait for the slow read
+        self.assertEqual(self._forward('a=1')[0], 0)
+        self.assertLess(time.time() - started, 0.8)
+        thread.join()
+
+        self.assertEqual(results['slow'][0], 0)
+        self.assertIn('key: slow', results['slow'][1])
+
+    def test_no_daemon(self):
+        self.assertIsNone(forward(os.path.join(self.dir, 'missing.sock'), ['a=1']))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import unittest
+from hawkular.metrics import MetricType
+from hawkular_client_cli.ingest import InvalidLines, parse_line, parse_lines
+
+def _point(metric):
+    return metric['type'], metric['id'], metric['data'][0]['value'], metric['data'][0]['timestamp']
+
+class ParseLineTest(unittest.TestCase):
+    def _parse(self, line, metric_type=MetricType.Gauge):
+        return _point(parse_line(line, metric_type, 1000))
+
+    def test_line(self):
+        self.assertEqual(self._parse('h1 1.5'), (MetricType.Gauge, 'h1', 1.5, 1000))
+        self.assertEqual(self._parse('h1 2 3000 counter'), (MetricType.Counter, 'h1', 2, 3000))
+        self.assertEqual(self._parse('h1 up 3000 string'), (MetricType.String, 'h1', 'up', 3000))
+
+    def test_json(self):
+        self.assertEqual(self._parse('{"key": "h1", "value": "7", "timestamp": 2000}'),
+                         (MetricType.Gauge, 'h1', 7.0, 2000))
+        self.assertEqual(self._parse('{"id": "h1", "value": 12345678901234567, "type": "counter"}'),
+                         (MetricType.Counter, 'h1', 12345678901234567, 1000))
+
+    def test_skipped(self):
+        self.assertIsNone(parse_line('  ', MetricType.Gauge, 1000))
+        self.assertIsNone(parse_line('# comment', MetricType.Gauge, 1000))
+
+    def test_invalid(self):
+        for line in ['h1', 'h1 1 2 gauge extra', 'h1 abc', 'h1 nan', 'h1 1 now',
+                     'h1 1 1000 unknown', 'h1 1.5 1000 counter', '{"key": "h1"}',
+                     '{"key": "h1", "value": [1]}', '{"key": "h1", "value": true, "type": "counter"}']:
+            with self.assertRaises(ValueError, msg=line):
+                parse_line(line, MetricType.Gauge, 1000)
+
+    def test_counter(self):
+        self.assertEqual(self._parse('h1 1e3', MetricType.Counter), (MetricType.Counter, 'h1', 1000, 1000))
+
+class ParseLinesTest(unittest.TestCase):
+    def test_errors(self):
+        errors = InvalidLines(max_lines=2)
+        lines = ['h1 1', 'h2 abc', 'h3 x', 'h4 2', 'h5 y']
+        metrics = list(parse_lines(lines, MetricType.Gauge, 1000, errors=errors))
+
+        self.assertEqual([m['id'] for m in metrics], ['h1', 'h4'])
+        self.assertEqual(errors.count, 3)
+        self.assertEqual([number for number, _ in errors.lines], [2, 3])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import os
+import shutil
+import tempfile
+import unittest
+from hawkular.metrics import HawkularMetricsClient
+from hawkular_client_cli.mock_server import MockServer
+from hawkular_client_cli.migrate import export_metrics, import_metrics, read_lines
+
+_KEYS = ['key{0}'.format(i) for i in range(5)]
+
+class _Interrupt(Exception):
+    pass
+
+def _interrupt(message):
+    """ Get a log function failing on the second log of message
+
+    Chunks are logged before they are checkpointed, so the first chunk is
+    complete when the second one is logged.
+    """
+    logged = []
+
+    def log(*args):
+        if args and args[0] == message:
+            logged.append(args)
+            if len(logged) == 2:
+                raise _Interrupt()
+    return log
+
+class MigrateTest(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer()
+        self.port = int(self.server.start().rsplit(':', 1)[1])
+        self.source = self._client('source')
+        self.target = self._client('target')
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'export')
+        for i, key in enumerate(_KEYS):
+            self.server.store.add('source', 'gauges', key,
+                                  [{'timestamp': t, 'value': i + t / 1000.0} for t in range(1000, 4000, 1000)])
+            self.server.store.metrics[('source', 'gauges', key)]['tags']['app'] = 'web'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.dir)
+
+    def _client(self, tenant):
+        return HawkularMetricsClient(tenant_id=tenant, host='127.0.0.1', port=self.port,
+                                     username=tenant, password=tenant, auto_set_legacy_api=False)
+
+    def _export(self, log=None):
+        return export_metrics(self.source, self.path, 0, 10000, tags={'app': 'web'},
+                              chunk_size=2, log=log)
+
+    def _import(self, log=None):
+        return import_metrics(self.target, self.path, batch_size=10, log=log, flush_interval=0)
+
+    def _read_keys(self):
+        """ Get the keys whose datapoints were read, and clear the recorded requests
+        """
+        keys = sorted(path.split('/')[-2] for method, path, _ in self.server.requests
+                      if method == 'GET' and path.endswith('/raw'))
+        del self.server.requests[:]
+        return keys
+
+    def _stored(self, tenant):
+        store = self.server.store
+        return dict((metric_id, store.metrics[(t, 'gauges', metric_id)]['data'])
+                    for t, _, metric_id in store.metrics if t == tenant)
+
+    def test_resume_export(self):
+        with self.assertRaises(_Interrupt):
+            self._export(_interrupt('Exported:'))
+        self.assertEqual(self._read_keys(), _KEYS[:4])
+
+        keys, datapoints = self._export()
+        self.assertEqual((keys, datapoints), (3, 9))
+        self.assertEqual(self._read_keys(), _KEYS[2:])
+
+        lines = [line for i in range(3)
+                 for line in read_lines(os.path.join(self.path, 'data-{0:06d}.jsonl.gz'.format(i)))]
+        self.assertEqual([line['id'] for line in lines], _KEYS)
+        # Datapoints are exported in the server order, newest first
+        self.assertEqual(lines[1]['data'], [{'timestamp': t, 'value': 1 + t / 1000.0}
+                                            for t in range(3000, 0, -1000)])
+
+    def test_resume_import(self):
+        self._export()
+        with self.assertRaises(_Interrupt):
+            self._import(_interrupt('Imported:'))
+        self.assertEqual(sorted(self._stored('target')), _KEYS)
+        self.assertEqual([k for k, data in sorted(self._stored('target').items()) if data], _KEYS[:4])
+        del self.server.requests[:]
+
+        definitions, datapoints = self._import()
+        self.assertEqual((definitions, datapoints), (0, 9))
+        # Only the chunks not checkpointed are pushed again
+        pushed = [r for r in self.server.requests if r[0] == 'POST']
+        self.assertEqual(len(pushed), 2)
+        self.assertEqual(self._stored('target'), self._stored('source'))
+
+    def test_completed(self):
+        self._export()
+        self._import()
+        del self.server.requests[:]
+
+        self.assertEqual(self._export(), (0, 0))
+        self.assertEqual(self._import(), (0, 0))
+        self.assertEqual(self.server.requests, [])
+
+    def test_other_source(self):
+        self._export()
+        with self.assertRaises(ValueError):
+            export_metrics(self.target, self.path, 0, 10000)
+
+    def test_incomplete_export(self):
+        with self.assertRaises(_Interrupt):
+            self._export(_interrupt('Exported:'))
+        with self.assertRaises(ValueError):
+            self._import()
+
+    def test_other_target(self):
+        self._export()
+        self._import()
+
+        # Importing into another tenant starts over
+        other = self._client('other')
+        self.assertEqual(import_metrics(other, self.path, batch_size=10, flush_interval=0), (5, 15))
+        self.assertEqual(self._stored('other'), self._stored('source'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import io
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from hawkular_client_cli.output import get_writer
+
+_KEY = 'm\u00e9moire'
+_VALUES = [{'timestamp': 1000, 'value': 1.5}, {'timestamp': 2000, 'value': 2}]
+
+class OutputFileTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'out')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _write(self, output_format, tenant=None):
+        writer = get_writer(output_format, self.path)
+        writer.tenant = tenant
+        writer.write_metric(_KEY, _VALUES)
+        writer.write_definitions([{'id': _KEY, 'tags': {'unit': '\u00b0C'}}])
+        writer.close()
+        with io.open(self.path, encoding='utf-8', newline='') as f:
+            return f.read()
+
+    def test_csv(self):
+        self.assertEqual(self._write('csv', tenant='t'),
+                         'tenant,key,timestamp,value\r\n'
+                         't,{0},1000,1.5\r\n'
+                         't,{0},2000,2\r\n'
+                         'tenant,key,tags\r\n'
+                         't,{0},"{{""unit"": ""\\u00b0C""}}"\r\n'.format(_KEY))
+
+    def test_jsonl(self):
+        lines = [json.loads(line) for line in self._write('jsonl').splitlines()]
+
+        self.assertEqual(lines, [{'key': _KEY, 'timestamp': 1000, 'value': 1.5},
+                                 {'key': _KEY, 'timestamp': 2000, 'value': 2},
+                                 {'key': _KEY, 'tags': {'unit': '\u00b0C'}}])
+
+    def test_text(self):
+        text = self._write('text')
+
+        self.assertTrue(text.startswith('key: {0}\nvalues:\n'.format(_KEY)))
+        self.assertIn(') 1.5\n', text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import io
+import os
+import json
+import time
+import shutil
+import tempfile
+import unittest
+from hawkular.metrics import HawkularMetricsClient, MetricType, create_metric, create_datapoint
+from hawkular_client_cli.mock_server import MockServer
+from hawkular_client_cli.push import PushError, PushQueue, push_metrics
+from hawkular_client_cli.spool import Spool
+
+_TENANT = 'test'
+
+def _metrics(keys, timestamp=1000):
+    return [create_metric(MetricType.Gauge, key, create_datapoint(1.0, timestamp)) for key in keys]
+
+class _ServerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer()
+        url = self.server.start()
+        self.client = HawkularMetricsClient(tenant_id=_TENANT, host='127.0.0.1',
+                                            port=int(url.rsplit(':', 1)[1]),
+                                            username=_TENANT, password=_TENANT,
+                                            auto_set_legacy_api=False)
+        # Do not wait between retries
+        self.backoff, PushQueue.BACKOFF = PushQueue.BACKOFF, 0
+
+    def tearDown(self):
+        PushQueue.BACKOFF = self.backoff
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _requests(self, path):
+        return [r for r in self.server.requests if r[0] == 'POST' and r[1] == path]
+
+    def _stored(self):
+        return sorted(metric_id for tenant, _, metric_id in self.server.store.metrics if tenant == _TENANT)
+
+class PushMetricsTest(_ServerTest):
+    def test_batches(self):
+        keys = ['key{0:02}'.format(i) for i in range(25)]
+        total = push_metrics(self.client, _metrics(keys), batch_size=10)
+
+        self.assertEqual(total, 25)
+        self.assertEqual(len(self._requests('/hawkular/metrics/metrics/raw')), 3)
+        self.assertEqual(self._stored(), keys)
+
+    def test_no_batch_size(self):
+        push_metrics(self.client, _metrics(['a', 'b', 'c']), batch_size=0)
+
+        self.assertEqual(len(self._requests('/hawkular/metrics/metrics/raw')), 1)
+
+    def test_rejected_key(self):
+        self.server.rejected.add('bad')
+        with self.assertRaises(PushError) as context:
+            push_metrics(self.client, _metrics(['a', 'bad', 'b']), batch_size=10)
+
+        failures = context.exception.failures
+        self.assertEqual([(t, i) for t, i, _ in failures], [(MetricType.Gauge, 'bad')])
+        self.assertEqual(context.exception.total, 3)
+        self.assertEqual(self._stored(), ['a', 'b'])
+        # The rejected bulk request falls back to one request per metric
+        self.assertEqual(len(self._requests('/hawkular/metrics/gauges/raw')), 3)
+
+    def test_retry(self):
+        self.server.errors = 2
+        stats = {}
+        push_metrics(self.client, _metrics(['a', 'b']), batch_size=10, retries=3, stats=stats)
+
+        self.assertEqual(stats['retries'], 2)
+        self.assertEqual(len(self._requests('/hawkular/metrics/metrics/raw')), 3)
+        self.assertEqual(self._stored(), ['a', 'b'])
+
+    def test_retries_exhausted(self):
+        self.server.errors = 3
+        with self.assertRaises(Exception) as context:
+            push_metrics(self.client, _metrics(['a']), batch_size=10, retries=1)
+
+        self.assertEqual(getattr(context.exception, 'code', None), 503)
+        self.assertEqual(self._stored(), [])
+
+    def test_string_values(self):
+        # KEY=VALUE pairs push values as strings, the server stores numbers
+        push_metrics(self.client, [create_metric(MetricType.Gauge, 'a', create_datapoint('1.5', 1000)),
+                                   create_metric(MetricType.Counter, 'b', create_datapoint('2', 1000))])
+        store = self.server.store.metrics
+
+        self.assertEqual(store[(_TENANT, 'gauges', 'a')]['data'], {1000: 1.5})
+        self.assertEqual(type(store[(_TENANT, 'counters', 'b')]['data'][1000]), int)
+
+class SpoolTest(_ServerTest):
+    def setUp(self):
+        _ServerTest.setUp(self)
+        self.dir = tempfile.mkdtemp()
+        self.spool = Spool(os.path.join(self.dir, 'spool.jsonl'))
+
+    def tearDown(self):
+        _ServerTest.tearDown(self)
+        shutil.rmtree(self.dir)
+
+    def _spooled(self):
+        if not os.path.exists(self.spool.path):
+            return []
+        with io.open(self.spool.path, encoding='utf-8') as f:
+            return [json.loads(line)['id'] for line in f]
+
+    def test_spool(self):
+        self.server.errors = 2
+        stats = {}
+        push_metrics(self.client, _metrics(['a', 'b']), batch_size=10, retries=1,
+                     spool=self.spool, stats=stats)
+
+        self.assertEqual(stats['spooled'], 2)
+        self.assertEqual(self._spooled(), ['a', 'b'])
+        self.assertEqual(self._stored(), [])
+
+    def test_cooldown(self):
+        self.server.errors = 2
+        queue = PushQueue(self.client, batch_size=1, retries=1, spool=self.spool)
+        queue.add(_metrics(['a'])[0])
+        queue.add(_metrics(['b'])[0])
+
+        self.assertTrue(queue.is_down())
+        # The second batch is spooled without trying the server
+        self.assertEqual(len(self._requests('/hawkular/metrics/metrics/raw')), 2)
+        self.assertEqual(self._spooled(), ['a', 'b'])
+
+    def test_replay(self):
+        self.server.errors = 2
+        push_metrics(self.client, _metrics(['a', 'b']), batch_size=10, retries=1, spool=self.spool)
+        stats = {}
+        push_metrics(self.client, _metrics(['c']), batch_size=10, spool=self.spool, stats=stats)
+
+        self.assertEqual(stats['spooled'], 0)
+        self.assertEqual(self._stored(), ['a', 'b', 'c'])
+        self.assertFalse(os.listdir(self.dir))
+
+    def test_replay_fails(self):
+        self.spool.append(_metrics(['a', 'b']))
+        queue = PushQueue(self.client, batch_size=10, retries=0, spool=self.spool)
+        self.server.errors = 1
+        queue.replay()
+
+        # Metrics claimed by the failed replay are spooled again
+        self.assertEqual(self._spooled(), ['a', 'b'])
+        self.assertEqual(os.listdir(self.dir), ['spool.jsonl'])
+
+    def test_spool_size(self):
+        metric = _metrics(['k\u00e9y'])[0]
+        line = (json.dumps(metric, ensure_ascii=False) + '\n').encode('utf-8')
+        self.spool.max_bytes = 2 * len(line)
+        self.spool.append([metric] * 3)
+
+        self.assertEqual(self.spool.size(), 2 * len(line))
+        self.assertEqual(self.spool.dropped, 1)
+
+    def test_flush_interval(self):
+        queue = PushQueue(self.client, batch_size=10, flush_interval=0.2)
+        queue.start()
+        try:
+            queue.add(_metrics(['a'])[0])
+            # No more input, the timer thread pushes the buffered metric
+            deadline = time.time() + 5
+            while not self._stored() and time.time() < deadline:
+                time.sleep(0.05)
+        finally:
+            queue.stop()
+
+        self.assertEqual(self._stored(), ['a'])
+        self.assertEqual(queue.buffer, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import re
+import unittest
+from hawkular_client_cli.rules import RuleSet, literal_prefix
+
+_KEYS = ['machine/example.com/cpu', 'machine/example.com/memory.usage', 'machine',
+         'machin', 'disk/sda', 'disk/sdb', 'net', 'xnet', 'ABC', 'abc', '']
+
+class LiteralPrefixTest(unittest.TestCase):
+    def test_literal(self):
+        self.assertEqual(literal_prefix('machine/'), 'machine/')
+
+    def test_quantifiers(self):
+        self.assertEqual(literal_prefix('machine*'), 'machin')
+        self.assertEqual(literal_prefix('machine?'), 'machin')
+        self.assertEqual(literal_prefix('machine{0,1}'), 'machin')
+        self.assertEqual(literal_prefix('machine+'), 'machine')
+        self.assertEqual(literal_prefix('a*'), '')
+
+    def test_special(self):
+        self.assertEqual(literal_prefix('machine.example'), 'machine')
+        self.assertEqual(literal_prefix('disk/sd[ab]'), 'disk/sd')
+        self.assertEqual(literal_prefix('disk\\/sda'), 'disk')
+        self.assertEqual(literal_prefix('.*'), '')
+
+    def test_alternatives(self):
+        self.assertEqual(literal_prefix('disk|net'), '')
+        self.assertEqual(literal_prefix('disk/(sda|sdb)'), '')
+
+    def test_anchor(self):
+        self.assertEqual(literal_prefix('^disk/'), 'disk/')
+        self.assertEqual(literal_prefix('^.*net'), '')
+
+    def test_group(self):
+        self.assertEqual(literal_prefix('(disk)/'), '')
+        self.assertEqual(literal_prefix('(?i)abc'), '')
+
+    def test_matching_keys(self):
+        # Every key matching a regex starts with its prefix
+        for regex in ['machine*', 'machine?/', 'machine{0}', '^disk/sd[ab]', '(?i)abc',
+                      'disk|net', '^(x)?net', 'disk/sd.', 'net$', '']:
+            prefix = literal_prefix(regex)
+            for key in _KEYS:
+                if re.match(regex, key):
+                    self.assertTrue(key.startswith(prefix), (regex, key, prefix))
+
+class RuleSetTest(unittest.TestCase):
+    def test_tags(self):
+        rules = RuleSet([{'regex': 'machine/', 'tags': {'type': 'machine'}},
+                         {'regex': '.*/memory', 'tags': {'unit': 'bytes'}},
+                         {'regex': 'machine/example.com/memory', 'tags': {'type': 'memory'}}])
+
+        # Later rules override tags of earlier rules
+        self.assertEqual(rules.tags('machine/example.com/memory.usage'), {'type': 'memory', 'unit': 'bytes'})
+        self.assertEqual(rules.tags('machine/example.com/cpu'), {'type': 'machine'})
+        self.assertEqual(rules.tags('disk/sda'), {})
+
+    def test_same_as_regex(self):
+        regexes = ['machine*', 'machine?/', 'machine{0}', '^disk/sd[ab]', '(?i)abc',
+                   'disk|net', '^(x)?net', 'disk/sd.', 'net$', '']
+        rules = RuleSet([{'regex': regex, 'tags': {'rule{0}'.format(i): 'yes'}}
+                         for i, regex in enumerate(regexes)])
+        for key in _KEYS:
+            expected = dict(('rule{0}'.format(i), 'yes') for i, regex in enumerate(regexes)
+                            if re.match(regex, key))
+            self.assertEqual(rules.tags(key), expected, key)
+
+    def test_memo(self):
+        rules = RuleSet([{'regex': 'net', 'tags': {'type': 'net'}}])
+        rules.tags('net').update({'type': 'changed'})
+
+        self.assertEqual(rules.tags('net'), {'type': 'net'})
+
+    def test_empty(self):
+        self.assertEqual(RuleSet(None).tags('net'), {})
+
+if __name__ == '__main__':
+    unittest.main()
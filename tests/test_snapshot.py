@@ -0,0 +1,139 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import os
+import shutil
+import tempfile
+import unittest
+from hawkular.metrics import MetricType
+from hawkular_client_cli.snapshot import SnapshotClient, write_snapshot, _buckets
+
+def _data(values, start=1000, step=1000):
+    return [{'timestamp': start + i * step, 'value': value} for i, value in enumerate(values)]
+
+_METRICS = [
+    {'type': MetricType.Counter, 'id': 'requests', 'tags': {'host': 'a'},
+     'data': _data([1, 2, 3, 1 << 40])},
+    {'type': MetricType.Gauge, 'id': 'memory', 'tags': {'host': 'b'},
+     # Unsorted datapoints are written in timestamp order
+     'data': list(reversed(_data([0.5, 1.5, -2.25])))},
+    {'type': MetricType.String, 'id': 'status', 'tags': {'host': 'a'},
+     'data': _data(['up', '', 'd\u00e9graded', 'down'])},
+    {'type': MetricType.Gauge, 'id': 'empty', 'tags': {}, 'data': []},
+]
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'metrics.snap')
+        self.total = write_snapshot(self.path, iter(_METRICS), tenant='test', start=0, end=10000)
+        self.client = SnapshotClient(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _values(self, metric_type, metric_id, **options):
+        return [(v['timestamp'], v['value'])
+                for v in self.client.query_metric(metric_type, metric_id, order='ASC', **options)]
+
+    def test_index(self):
+        self.assertEqual(self.total, 11)
+        self.assertEqual(self.client.tenant_id, 'test')
+        self.assertEqual(dict((m['id'], m['values']) for m in self.client.index['metrics']),
+                         {'requests': 'int64', 'memory': 'float64', 'status': 'packed', 'empty': 'int64'})
+
+    def test_int64(self):
+        values = self._values(MetricType.Counter, 'requests')
+
+        self.assertEqual(values, [(1000, 1), (2000, 2), (3000, 3), (4000, 1 << 40)])
+        self.assertTrue(all(type(v) is int for _, v in values))
+
+    def test_float64(self):
+        self.assertEqual(self._values(MetricType.Gauge, 'memory'),
+                         [(1000, 0.5), (2000, 1.5), (3000, -2.25)])
+
+    def test_packed(self):
+        self.assertEqual(self._values(MetricType.String, 'status'),
+                         [(1000, 'up'), (2000, ''), (3000, 'd\u00e9graded'), (4000, 'down')])
+
+    def test_empty(self):
+        self.assertEqual(self._values(MetricType.Gauge, 'empty'), [])
+        self.assertEqual(self._values(MetricType.Gauge, 'missing'), [])
+
+    def test_time_range(self):
+        self.assertEqual(self._values(MetricType.Counter, 'requests', start=2000, end=4000),
+                         [(2000, 2), (3000, 3)])
+        self.assertEqual(self._values(MetricType.Counter, 'requests', start=2500),
+                         [(3000, 3), (4000, 1 << 40)])
+        self.assertEqual(self._values(MetricType.Counter, 'requests', start=5000), [])
+
+    def test_order_and_limit(self):
+        values = self.client.query_metric(MetricType.Counter, 'requests', limit=2)
+
+        self.assertEqual([v['timestamp'] for v in values], [4000, 3000])
+
+    def test_definitions(self):
+        definitions = self.client.query_metric_definitions(host='a')
+
+        self.assertEqual(sorted(d['id'] for d in definitions), ['requests', 'status'])
+        self.assertEqual([d['id'] for d in self.client.query_metric_definitions(MetricType.Gauge)],
+                         ['memory', 'empty'])
+
+    def test_stats(self):
+        buckets = self.client.query_metric_stats(MetricType.Gauge, 'memory', start=1000, end=4000,
+                                                 bucketDuration='2s')
+
+        self.assertEqual([(b['start'], b['end'], b['samples']) for b in buckets],
+                         [(1000, 3000, 2), (3000, 4000, 1)])
+        self.assertEqual(buckets[0]['avg'], 1.0)
+        self.assertEqual(buckets[1]['min'], -2.25)
+
+    def test_buckets(self):
+        buckets = _buckets([1000, 2000, 3000, 7000], [4, 1, 3, 10], 0, 6000, 3000)
+
+        self.assertEqual(buckets[0], {'start': 0, 'end': 3000, 'samples': 2, 'empty': False,
+                                      'min': 1, 'max': 4, 'sum': 5, 'avg': 2.5, 'median': 4})
+        self.assertEqual(buckets[1]['samples'], 1)
+        self.assertEqual(len(buckets), 2)
+        # The last bucket ends at the end of the range
+        self.assertEqual(_buckets([], [], 0, 5000, 3000)[1], {'start': 3000, 'end': 5000,
+                                                               'samples': 0, 'empty': True})
+
+    def test_failed_write(self):
+        def metrics():
+            yield _METRICS[0]
+            raise ValueError('query failed')
+
+        with self.assertRaises(ValueError):
+            write_snapshot(self.path, metrics())
+
+        # The earlier snapshot is kept, and no partial file is left
+        self.assertEqual(SnapshotClient(self.path).index['metrics'][0]['id'], 'requests')
+        self.assertEqual(os.listdir(self.dir), ['metrics.snap'])
+
+    def test_not_a_snapshot(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not a snapshot file')
+
+        with self.assertRaises(ValueError):
+            SnapshotClient(self.path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import threading
+import unittest
+from hawkular_client_cli.trace import Tracer
+
+class TracerTest(unittest.TestCase):
+    def setUp(self):
+        self.tracer = Tracer()
+
+    def _spans(self):
+        return dict((span['name'], span) for span in self.tracer.finish())
+
+    def test_nested(self):
+        with self.tracer.span('outer'):
+            with self.tracer.span('inner'):
+                self.tracer.add('request', 'http', 0, 1)
+
+        spans = self._spans()
+        self.assertEqual(spans['outer']['parent'], self.tracer.root['id'])
+        self.assertEqual(spans['inner']['parent'], spans['outer']['id'])
+        self.assertEqual(spans['request']['parent'], spans['inner']['id'])
+
+    def test_threads(self):
+        opened, closed = threading.Event(), threading.Event()
+
+        def worker():
+            with self.tracer.span('worker'):
+                opened.set()
+                closed.wait(10)
+                self.tracer.add('worker request', 'http', 0, 1)
+
+        thread = threading.Thread(target=worker)
+        with self.tracer.span('main'):
+            thread.start()
+            opened.wait(10)
+            # A phase open in another thread is not the parent of this one
+            with self.tracer.span('child'):
+                pass
+            closed.set()
+            thread.join()
+            # Threads without open phases use the innermost main thread phase
+            pool = threading.Thread(target=self.tracer.add, args=('pool request', 'http', 0, 1))
+            pool.start()
+            pool.join()
+
+        spans = self._spans()
+        self.assertEqual(spans['child']['parent'], spans['main']['id'])
+        self.assertEqual(spans['worker']['parent'], spans['main']['id'])
+        self.assertEqual(spans['worker request']['parent'], spans['worker']['id'])
+        self.assertEqual(spans['pool request']['parent'], spans['main']['id'])
+        self.assertEqual(self.tracer.main, [self.tracer.root])
+
+if __name__ == '__main__':
+    unittest.main()
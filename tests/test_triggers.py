@@ -0,0 +1,73 @@
+"""
+    Copyright 2016 Red Hat, Inc. and/or its affiliates
+    and other contributors.
+
+    Licensed under the Apache License, Version 2.0 (the "License");
+    you may not use this file except in compliance with the License.
+    You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+    Unless required by applicable law or agreed to in writing, software
+    distributed under the License is distributed on an "AS IS" BASIS,
+    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+    See the License for the specific language governing permissions and
+    limitations under the License.
+"""
+
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+
+import unittest
+from hawkular_client_cli.triggers import iter_trigger_pages
+
+class _Client(object):
+    """ Fake alerts client holding count triggers
+    """
+    def __init__(self, count, paging=True):
+        self.triggers = [{'id': 't{0}'.format(i)} for i in range(count)]
+        self.paging = paging
+        self.urls = []
+
+    def _service_url(self, path, params):
+        return path, params
+
+    def _get(self, url):
+        _, params = url
+        self.urls.append(params)
+        if not self.paging:
+            return self.triggers
+        start = params['page'] * params['per_page']
+        return self.triggers[start:start + params['per_page']]
+
+class TriggerPagesTest(unittest.TestCase):
+    def _pages(self, client, page_size=2):
+        return [[t['id'] for t in page] for page in iter_trigger_pages(client, page_size=page_size)]
+
+    def test_pages(self):
+        client = _Client(5)
+
+        self.assertEqual(self._pages(client), [['t0', 't1'], ['t2', 't3'], ['t4']])
+        self.assertEqual([params['page'] for params in client.urls], [0, 1, 2])
+
+    def test_full_last_page(self):
+        client = _Client(4)
+
+        self.assertEqual(self._pages(client), [['t0', 't1'], ['t2', 't3'], []])
+
+    def test_paging_ignored(self):
+        # The server returns all the triggers for every page
+        client = _Client(3, paging=False)
+
+        self.assertEqual(self._pages(client), [['t0', 't1', 't2']])
+        self.assertEqual(len(client.urls), 2)
+
+    def test_filters(self):
+        client = _Client(1)
+        list(iter_trigger_pages(client, ids=['a', 'b'], tags={'b': '2', 'a': '1'}))
+
+        self.assertEqual(client.urls[0]['triggerIds'], 'a,b')
+        self.assertEqual(client.urls[0]['tags'], 'a|1,b|2')
+
+if __name__ == '__main__':
+    unittest.main()